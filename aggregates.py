@@ -0,0 +1,740 @@
+"""Aggregates over the postings dataset, built once per load and shared by the dashboard charts."""
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from dictionary import Dictionary, pack, unpack
+from postings import RowIndex
+from sketches import DEFAULT_COMPRESSION, QuantileSketch, compress
+
+# Version of the aggregates' layout. Bump it whenever CountCube or
+# SalaryAggregates change what they compute or store, so snapshots written by an
+# older version are rebuilt instead of loaded.
+AGGREGATES_VERSION = 8
+
+# Dimensions of the count cube, in the order its cells are sorted by.
+DIMENSIONS = ['skill_name', 'state', 'formatted_experience_level', 'formatted_work_type', 'company_name']
+
+# Dimensions of the count cube's job cells: those of a job itself, whatever its skills.
+JOB_DIMENSIONS = DIMENSIONS[1:]
+
+# Dimensions the salary sketches are kept for. Keeping the applies count itself
+# rather than its box plot bucket lets the buckets' thresholds move as postings
+# are appended.
+SKETCH_DIMENSIONS = ['skill_name', 'state', 'company_size_label', 'applies']
+
+# A box of the salary box plot merges the sketches of every applies count in its
+# bucket, so each group's own sketch is kept at a fraction of the compression
+# the merged sketch is read at. Groups of no more salaries than that compression
+# keep them all, so boxes that small are exact.
+GROUP_COMPRESSION_RATIO = 4
+
+# Selection dimensions of the top-companies chart.
+SELECTION_DIMENSIONS = ['skill_name', 'state', 'formatted_work_type']
+
+# Companies kept per selection for the top-companies chart: the most it can show.
+TOP_COMPANIES = 20
+
+# Applies buckets of the salary box plot, in legend order.
+APPLIES_CATEGORIES = ['No\nApplications', 'Average\nApplications', 'Above Average\nApplications']
+
+# How the columns of the count cube's cells, and of the salary sketch groups,
+# combine when those of disjoint rows are merged.
+CELL_MERGE = {'count': 'sum', 'first_row': 'min'}
+GROUP_MERGE = {'count': 'sum', 'sum': 'sum', 'min': 'min', 'max': 'max'}
+
+
+def unify_categories(frames, columns):
+    """Return ``frames`` with the categorical ``columns`` recoded to the sorted union of their categories.
+
+    That is the dtype a load of all their rows at once would infer, so merged
+    frames group and sort as a whole-file build does. Frames already of that
+    dtype are returned as they are.
+    """
+    dtypes = {}
+    for column in columns:
+        categories = frames[0][column].cat.categories
+        for frame in frames[1:]:
+            categories = categories.union(frame[column].cat.categories)
+        dtypes[column] = pd.CategoricalDtype(categories.sort_values())
+    return [
+        frame.assign(**{
+            column: frame[column].cat.set_categories(dtype.categories)
+            for column, dtype in dtypes.items() if frame[column].dtype != dtype
+        })
+        for frame in frames
+    ]
+
+
+def merge_tables(frames, keys, merge):
+    """Merge ``frames``, each one row per ``keys``, into one sorted by ``keys``, combining columns with ``merge``."""
+    frame = pd.concat(frames, ignore_index=True)
+    return frame.groupby(keys, observed=True, dropna=False).agg(merge).reset_index()
+
+
+def _group(columns, radices):
+    # The distinct rows of the code columns, as columns sorted by code, and
+    # the group of each row.
+    if np.prod(radices, dtype='float64') < 2**63:
+        keys, groups = np.unique(pack(columns, radices), return_inverse=True)
+        return unpack(keys, radices), groups
+    keys, groups = np.unique(np.column_stack(columns), axis=0, return_inverse=True)
+    return list(keys.T), groups.ravel()
+
+
+def _grouped_cells(columns, dimensions, radices, counts, first_rows):
+    # Cells of the code columns, summing counts and keeping the earliest first row of each.
+    keys, groups = _group(columns, radices)
+    first_row = np.full(len(keys[0]), np.iinfo(np.int64).max)
+    np.minimum.at(first_row, groups, first_rows)
+    cells = pd.DataFrame(dict(zip(dimensions, keys)))
+    cells['count'] = np.bincount(groups, weights=counts, minlength=len(cells)).astype(np.int64)
+    cells['first_row'] = first_row
+    return cells
+
+
+def _coded_cells(codes, dimensions, radices, offset=0):
+    # Cells of the rows whose codes are codes[dimension], the first at position offset.
+    rows = len(codes[dimensions[0]])
+    return _grouped_cells(
+        [codes[dimension] for dimension in dimensions], dimensions, radices,
+        np.ones(rows), np.arange(offset, offset + rows))
+
+
+def _merged_cells(segments, dimensions, radices):
+    cells = pd.concat(segments, ignore_index=True)
+    return _grouped_cells(
+        [cells[dimension].to_numpy() for dimension in dimensions], dimensions, radices,
+        cells['count'].to_numpy(), cells['first_row'].to_numpy())
+
+
+def _ranks(dictionary, codes):
+    # Position of each code's label in sorted order, -1 for missing.
+    return np.where(codes >= 0, dictionary.ranks()[np.maximum(codes, 0)], -1)
+
+
+def _state_index(cells):
+    return cells.groupby('state').indices
+
+
+def _radices(dictionaries, dimensions):
+    # Radix of each dimension's codes, counting -1 for missing.
+    return [len(dictionaries[dimension]) + 1 for dimension in dimensions]
+
+
+def _appended_segment(segments, indexes, delta, dimensions, radices):
+    # Adds delta as the last segment, merging the last two while the newer one
+    # is at least half the size of the older, and drops the merged ones' indexes.
+    segments = [*segments, delta]
+    while len(segments) > 1 and 2 * len(segments[-1]) >= len(segments[-2]):
+        segments = [*segments[:-2], _merged_cells(segments[-2:], dimensions, radices)]
+    return segments, indexes[:len(segments) - 1]
+
+
+class CountCube:
+    """Posting counts for every observed combination of :data:`DIMENSIONS`.
+
+    Built from :class:`~postings.JobSkills`: each posting counts once per skill
+    in the skill ``cells``, and once in the ``job_cells`` over
+    :data:`JOB_DIMENSIONS`, which answer the queries that do not split by skill.
+    Each cell also records the position at which its combination first
+    appears, so "in order of appearance" listings can be answered without
+    going back to the rows. Queries slice the cells by skill and state through a
+    :class:`~postings.RowIndex` over the cells and sum them, so their cost
+    depends on the number of distinct groups rather than the number of postings.
+
+    Cells hold each dimension as its code in ``dictionaries``, one
+    :class:`~dictionary.Dictionary` per dimension: queries filter and group on
+    integers, and only the labels of their results are decoded.
+
+    The cells are kept in segments: :meth:`appended` adds the cells of new
+    postings as a segment of their own, and queries sum over every segment.
+    Segments are merged once a newer one grows to half the size of the one
+    before it, so there are only logarithmically many.
+    """
+
+    def __init__(self, postings):
+        dictionaries = {dimension: Dictionary() for dimension in DIMENSIONS}
+        job_codes = {dimension: dictionaries[dimension].encode(postings.jobs[dimension]) for dimension in JOB_DIMENSIONS}
+        jobs = postings.bridge['job'].to_numpy()
+        codes = {dimension: job_codes[dimension][jobs] for dimension in JOB_DIMENSIONS}
+        codes['skill_name'] = dictionaries['skill_name'].encode(postings.bridge['skill_name'])
+        self._set_segments(
+            dictionaries,
+            [_coded_cells(codes, DIMENSIONS, _radices(dictionaries, DIMENSIONS))],
+            [_coded_cells(job_codes, JOB_DIMENSIONS, _radices(dictionaries, JOB_DIMENSIONS))],
+        )
+
+    @classmethod
+    def from_cells(cls, cells, job_cells, dictionaries=None):
+        """Build a cube from precomputed ``cells`` and ``job_cells``, as the attributes of the same name.
+
+        With ``dictionaries``, their dimension columns hold codes of those
+        dictionaries instead of labels.
+        """
+        if dictionaries is None:
+            dictionaries = {dimension: Dictionary() for dimension in DIMENSIONS}
+            cells = cells.assign(**{
+                dimension: dictionaries[dimension].encode(cells[dimension]) for dimension in DIMENSIONS})
+            job_cells = job_cells.assign(**{
+                dimension: dictionaries[dimension].encode(job_cells[dimension]) for dimension in JOB_DIMENSIONS})
+        cube = cls.__new__(cls)
+        cube._set_segments({dimension: dictionaries[dimension] for dimension in DIMENSIONS}, [cells], [job_cells])
+        return cube
+
+    def _set_segments(self, dictionaries, segments, job_segments, indexes=(), job_indexes=(), skills=None):
+        self.dictionaries = dictionaries
+        self._segments = segments
+        self._job_segments = job_segments
+        self._indexes = list(indexes) + [RowIndex(cells) for cells in segments[len(indexes):]]
+        self._job_indexes = list(job_indexes) + [_state_index(cells) for cells in job_segments[len(job_indexes):]]
+        self.rows = sum(int(cells['count'].sum()) for cells in segments)
+        self.jobs = sum(int(cells['count'].sum()) for cells in job_segments)
+        self.skills = skills if skills is not None else self.in_order_of_appearance('skill_name')
+        self._top_companies = None
+
+    def _merged(self, segments, dimensions):
+        # The cells of segments as one frame of codes.
+        if len(segments) == 1:
+            return segments[0]
+        return _merged_cells(segments, dimensions, _radices(self.dictionaries, dimensions))
+
+    def _decoded(self, segments, dimensions):
+        # The cells of segments as one frame of labels, sorted as a cube built at once holds them.
+        cells = self._merged(segments, dimensions)
+        cells = cells.assign(**{
+            dimension: self.dictionaries[dimension].categorical(cells[dimension].to_numpy()) for dimension in dimensions
+        })
+        return cells.sort_values(dimensions, ignore_index=True)
+
+    @property
+    def cells(self):
+        """The skill cells as one frame of labels sorted by :data:`DIMENSIONS`, as a cube built at once holds them."""
+        return self._decoded(self._segments, DIMENSIONS)
+
+    @property
+    def job_cells(self):
+        """The job cells as one frame of labels sorted by :data:`JOB_DIMENSIONS`, as a cube built at once holds them."""
+        return self._decoded(self._job_segments, JOB_DIMENSIONS)
+
+    def appended(self, rows, jobs):
+        """Return a cube of these postings followed by new ones.
+
+        ``rows`` holds the new (job, skill) pairs, one row each with the job's
+        columns, and ``jobs`` the rows of ``rows`` whose job is new, one per
+        job. The new cube shares this one's segments, so building it costs
+        about the size of ``rows``; this cube is left as it was, for readers
+        still using it. Values never seen before get new codes in copies of
+        the dictionaries, so the shared segments keep theirs.
+        """
+        dictionaries = {dimension: dictionary.copy() for dimension, dictionary in self.dictionaries.items()}
+        codes = {dimension: dictionaries[dimension].encode(rows[dimension]) for dimension in DIMENSIONS}
+        job_codes = {dimension: dictionaries[dimension].encode(jobs[dimension]) for dimension in JOB_DIMENSIONS}
+        radices, job_radices = _radices(dictionaries, DIMENSIONS), _radices(dictionaries, JOB_DIMENSIONS)
+        delta = _coded_cells(codes, DIMENSIONS, radices, offset=self.rows)
+        skills = set(self.skills)
+        new_skills = [
+            skill for skill in self._in_order_of_appearance(delta, 'skill_name', dictionaries) if skill not in skills]
+        segments, indexes = _appended_segment(self._segments, self._indexes, delta, DIMENSIONS, radices)
+        job_segments, job_indexes = _appended_segment(
+            self._job_segments, self._job_indexes, _coded_cells(job_codes, JOB_DIMENSIONS, job_radices, self.jobs),
+            JOB_DIMENSIONS, job_radices)
+        cube = CountCube.__new__(CountCube)
+        cube._set_segments(dictionaries, segments, job_segments, indexes, job_indexes, self.skills + new_skills)
+        return cube
+
+    def _codes(self, **labels):
+        # The code of each of labels' dimension, None for a None label; None
+        # for all of them when one was never seen, so nothing matches.
+        codes = {dimension: None if label is None else self.dictionaries[dimension].code(label)
+                 for dimension, label in labels.items()}
+        unseen = any(label is not None and codes[dimension] is None for dimension, label in labels.items())
+        return None if unseen else codes
+
+    def select(self, skill=None, state=None, work_type=None):
+        """Return the skill cells matching ``skill``, ``state`` and ``work_type`` (``None`` matches all), as codes."""
+        codes = self._codes(skill_name=skill, state=state, formatted_work_type=work_type)
+        if codes is None:
+            return self._segments[0].iloc[:0]
+        parts = [
+            cells.iloc[index.rows(codes['skill_name'], codes['state'])]
+            for cells, index in zip(self._segments, self._indexes)
+        ]
+        return self._concat(parts, codes['formatted_work_type'])
+
+    def select_jobs(self, state=None, work_type=None):
+        """Return the job cells matching ``state`` and ``work_type`` (``None`` matches all), as codes."""
+        codes = self._codes(state=state, formatted_work_type=work_type)
+        if codes is None:
+            return self._job_segments[0].iloc[:0]
+        parts = [
+            cells if state is None else cells.iloc[index.get(codes['state'], np.empty(0, dtype=np.intp))]
+            for cells, index in zip(self._job_segments, self._job_indexes)
+        ]
+        return self._concat(parts, codes['formatted_work_type'])
+
+    @staticmethod
+    def _concat(parts, work_type):
+        cells = parts[0] if len(parts) == 1 else pd.concat(parts, ignore_index=True)
+        if work_type is not None:
+            cells = cells[cells['formatted_work_type'].to_numpy() == work_type]
+        return cells
+
+    def _counted(self, by, skill, state, work_type):
+        # Skill cells when the query splits or filters by skill, job cells otherwise.
+        if skill is None and 'skill_name' not in ([by] if isinstance(by, str) else by):
+            return self.select_jobs(state, work_type)
+        return self.select(skill, state, work_type)
+
+    def counts(self, by, skill=None, state=None, work_type=None):
+        """Return posting counts grouped by the ``by`` dimension(s) for the selection.
+
+        Like a ``groupby(by).size()`` over the selected postings: groups with a
+        missing key are left out and the result is sorted by key. A posting
+        counts once, or once per skill when ``by`` includes ``skill_name``.
+        """
+        cells = self._counted(by, skill, state, work_type)
+        keys = [by] if isinstance(by, str) else list(by)
+        # Grouped by the rank of each key's label, so groups come out sorted by label.
+        ranks = [self.dictionaries[key].ranks() for key in keys]
+        columns = [cells[key].to_numpy() for key in keys]
+        observed = np.logical_and.reduce([codes >= 0 for codes in columns])
+        counts = cells['count'].to_numpy()[observed]
+        columns = [key_ranks[codes[observed]] for key_ranks, codes in zip(ranks, columns)]
+        categories = [self.dictionaries[key].dtype().categories for key in keys]
+        if isinstance(by, str):
+            totals = np.bincount(columns[0], weights=counts, minlength=len(categories[0]))
+            groups = np.flatnonzero(totals)
+            index = pd.CategoricalIndex(pd.Categorical.from_codes(groups, dtype=self.dictionaries[by].dtype()), name=by)
+            return pd.Series(totals[groups].astype(np.int64), index=index, name='count')
+        codes, groups = _group(columns, [len(level) + 1 for level in categories])
+        totals = np.bincount(groups, weights=counts, minlength=len(codes[0]))
+        index = pd.MultiIndex(levels=categories, codes=codes, names=keys, verify_integrity=False)
+        return pd.Series(totals.astype(np.int64), index=index, name='count')
+
+    def total(self, skill=None, state=None, work_type=None):
+        """Return the number of postings in the selection, each counted once."""
+        return int(self._counted((), skill, state, work_type)['count'].sum())
+
+    def top(self, by, n, skill=None, state=None, work_type=None):
+        """Return the ``n`` largest groups of ``by`` for the selection, ties broken by key."""
+        return self.counts(by, skill, state, work_type).sort_values(ascending=False, kind='stable').head(n)
+
+    def skill_flows(self, state, top_n=5):
+        """Return the Sankey inputs for ``state``: its ``top_n`` skills and their experience-level flows.
+
+        The skills are the most frequent in the state, excluding ``other``, most
+        frequent first. The flows have one row per (skill, experience level) of
+        those skills with its ``count``.
+        """
+        skill_counts = self.counts('skill_name', state=state)
+        skill_counts = skill_counts[skill_counts.index != 'other']
+        top_skills = skill_counts.sort_values(ascending=False, kind='stable').head(top_n).index.tolist()
+        flows = self.counts(['skill_name', 'formatted_experience_level'], state=state)
+        flows = flows[flows.index.get_level_values('skill_name').isin(top_skills)]
+        return top_skills, flows.reset_index(name='count')
+
+    def in_order_of_appearance(self, by, skill=None, state=None):
+        """Return the non-missing values of ``by`` in the selection, in the order they first appear in the rows."""
+        return self._in_order_of_appearance(self.select(skill, state), by, self.dictionaries)
+
+    def top_companies(self):
+        """Return the :class:`TopCompanies` of this cube, built on first use and kept with it."""
+        if self._top_companies is None:
+            self._top_companies = TopCompanies(
+                self._merged(self._segments, DIMENSIONS), self._merged(self._job_segments, JOB_DIMENSIONS),
+                self.dictionaries,
+            )
+        return self._top_companies
+
+    @staticmethod
+    def _in_order_of_appearance(cells, by, dictionaries):
+        cells = cells[cells[by].to_numpy() >= 0]
+        first_row = cells.groupby(by)['first_row'].min()
+        return dictionaries[by].decode(first_row.sort_values(kind='stable').index.to_numpy()).tolist()
+
+
+class TopCompanies:
+    """The top-companies chart's inputs for every selection, precomputed from a count cube's cells.
+
+    A selection is a (skill, state, work type) of :data:`SELECTION_DIMENSIONS`,
+    where ``None`` matches every value. For each selection with postings this
+    holds its number of postings and of distinct companies, which the chart's
+    fallback rules read, and its ``k`` companies with the most postings of a
+    known experience level, ties broken by name, with their postings per
+    experience level. Skill selections count a posting once per skill, the
+    others once, as :meth:`CountCube.counts` does. Answering the chart is then a
+    dict lookup, whatever the number of postings.
+    """
+
+    def __init__(self, cells, job_cells, dictionaries, k=TOP_COMPANIES):
+        self.k = k
+        self._companies = dictionaries['company_name'].dtype().categories
+        self._levels = dictionaries['formatted_experience_level'].dtype().categories
+        self._entries = {}
+        for size in range(len(SELECTION_DIMENSIONS) + 1):
+            for keys in itertools.combinations(SELECTION_DIMENSIONS, size):
+                self._add(cells if 'skill_name' in keys else job_cells, list(keys), dictionaries)
+
+    def _add(self, cells, keys, dictionaries):
+        # Entries of the selections on keys: (total, distinct companies, top
+        # companies, then the company, level and count of their breakdown),
+        # companies and levels as positions in the sorted labels.
+        known = np.ones(len(cells), dtype=bool)
+        for key in keys:
+            known &= cells[key].to_numpy() >= 0
+        cells = cells[known]
+        radices = _radices(dictionaries, keys)
+        if keys:
+            selection = pack([cells[key].to_numpy() for key in keys], radices)
+        else:
+            selection = np.zeros(len(cells), dtype=np.int64)
+        frame = pd.DataFrame({
+            'selection': selection,
+            'company': _ranks(dictionaries['company_name'], cells['company_name'].to_numpy()),
+            'level': _ranks(dictionaries['formatted_experience_level'], cells['formatted_experience_level'].to_numpy()),
+            'count': cells['count'].to_numpy(),
+        })
+        totals = frame.groupby('selection')['count'].sum()
+        frame = frame[frame['company'].to_numpy() >= 0]
+        companies = frame.groupby('selection')['company'].nunique()
+        levels = frame[frame['level'].to_numpy() >= 0].groupby(
+            ['selection', 'company', 'level'])['count'].sum().reset_index()
+        top = levels.groupby(['selection', 'company'])['count'].sum().reset_index().sort_values(
+            ['selection', 'count', 'company'], ascending=[True, False, True], kind='stable',
+        ).groupby('selection').head(self.k)
+        levels = levels[pd.MultiIndex.from_frame(levels[['selection', 'company']]).isin(
+            pd.MultiIndex.from_frame(top[['selection', 'company']]))]
+
+        top_rows, top_companies = top.groupby('selection').indices, top['company'].to_numpy()
+        breakdowns = levels.groupby('selection').indices
+        level_columns = [levels[column].to_numpy() for column in ['company', 'level', 'count']]
+        empty = np.empty(0, dtype=np.intp)
+        codes = unpack(totals.index.to_numpy(), radices) if keys else []
+        for position, selection in enumerate(totals.index):
+            labels = dict.fromkeys(SELECTION_DIMENSIONS)
+            labels.update({key: dictionaries[key].labels[key_codes[position]] for key, key_codes in zip(keys, codes)})
+            rows = breakdowns.get(selection, empty)
+            self._entries[tuple(labels.values())] = (
+                int(totals[selection]), int(companies.get(selection, 0)), top_companies[top_rows.get(selection, empty)],
+                *(column[rows] for column in level_columns),
+            )
+
+    def _entry(self, skill, state, work_type):
+        empty = np.empty(0, dtype=np.intp)
+        return self._entries.get((skill, state, work_type), (0, 0, empty, empty, empty, empty))
+
+    def total(self, skill=None, state=None, work_type=None):
+        """Return the number of postings in the selection."""
+        return self._entry(skill, state, work_type)[0]
+
+    def company_count(self, skill=None, state=None, work_type=None):
+        """Return the number of distinct companies with postings in the selection."""
+        return self._entry(skill, state, work_type)[1]
+
+    def breakdown(self, n, skill=None, state=None, work_type=None):
+        """Return the selection's ``n`` top companies with their postings per experience level.
+
+        One row per (``company_name``, ``formatted_experience_level``) with its
+        ``job_count``, sorted by company then level, as the rows of
+        :meth:`CountCube.counts` by those two dimensions.
+        """
+        if n > self.k:
+            raise ValueError(f'only the top {self.k} companies of each selection are kept, not {n}')
+        _, _, top, companies, levels, counts = self._entry(skill, state, work_type)
+        keep = np.isin(companies, top[:n])
+        return pd.DataFrame({
+            'company_name': self._companies.take(companies[keep]),
+            'formatted_experience_level': self._levels.take(levels[keep]),
+            'job_count': counts[keep],
+        })
+
+
+def expand_salaries(rows, keys=('company_size_label',)):
+    """Return one row per salary bound of each posting in ``rows``, for the salary box plot.
+
+    Each posting contributes its ``min_salary`` then its ``max_salary`` as
+    ``salary``, alongside its ``keys`` columns and ``applies``. Bounds with no
+    salary and postings with no applies count are dropped. Built from the numeric
+    columns directly, so the result keeps their dtype.
+    """
+    salary = np.column_stack([rows['min_salary'].to_numpy(), rows['max_salary'].to_numpy()]).ravel()
+    positions = np.repeat(np.arange(len(rows)), 2)
+    expanded = pd.DataFrame({key: rows[key].array.take(positions) for key in keys})
+    expanded['salary'] = salary
+    expanded['applies'] = rows['applies'].to_numpy()[positions]
+    return expanded.dropna(subset=['salary', 'applies']).reset_index(drop=True)
+
+
+def top_company_sizes(size_max, n=3):
+    """Return the ``n`` company sizes with the highest salary in ``size_max``, in company-size order."""
+    top = size_max.nlargest(n).index
+    return [size for size in size_max.index if size in top]
+
+
+def best_paying_sizes(size_max, n=3):
+    """Return the (skill, company size) pairs of the ``n`` best-paying sizes of each skill in ``size_max``.
+
+    ``size_max`` is the highest salary per (``skill_name``, ``company_size_label``),
+    sorted by key; ties keep that order.
+    """
+    return size_max.sort_values(ascending=False, kind='stable').groupby(level='skill_name', observed=True).head(n).index
+
+
+def _weighted_quantiles(keys, values, counts, q):
+    # Series.quantile's linear interpolation over values repeated counts times,
+    # for every group of keys (codes 0 to n - 1) at once.
+    order = np.lexsort((values, keys))
+    keys, values, counts = keys[order], values[order], counts[order]
+    cumulative = np.cumsum(counts)
+    totals = np.bincount(keys, weights=counts)
+    starts = np.cumsum(totals) - totals
+    position = q * (totals - 1)
+    below = np.floor(position)
+    value = values[np.searchsorted(cumulative, starts + below, side='right')]
+    next_value = values[np.searchsorted(cumulative, starts + np.ceil(position), side='right')]
+    return value + (next_value - value) * (position - below)
+
+
+def applies_thresholds(groups, per_size=False):
+    """Return the box plot's "Average" cut-off of each skill from its salary sketch ``groups``.
+
+    That is the 75th percentile of applies over the salaries of the skill's
+    three best-paying company sizes or, with ``per_size``, over the salaries
+    of each (skill, company size). The groups' counts per applies value and
+    maxima give it exactly, without the rows.
+    """
+    keys = ['skill_name', 'company_size_label'] if per_size else ['skill_name']
+    if not per_size:
+        size_max = groups.groupby(['skill_name', 'company_size_label'], observed=True)['max'].max()
+        in_top = pd.MultiIndex.from_frame(groups[['skill_name', 'company_size_label']]).isin(best_paying_sizes(size_max))
+        groups = groups[in_top]
+    counts = groups.groupby([*keys, 'applies'], observed=True)['count'].sum().reset_index()
+    grouped = counts.groupby(keys, observed=True)
+    thresholds = _weighted_quantiles(
+        grouped.ngroup().to_numpy(), counts['applies'].to_numpy(dtype='float64'), counts['count'].to_numpy(), 0.75)
+    return pd.Series(thresholds, index=grouped.size().index, name='applies')
+
+
+def categorize_applies(applies, thresholds):
+    """Bucket ``applies`` into :data:`APPLIES_CATEGORIES` given each row's ``thresholds``."""
+    codes = np.select([applies == 0, applies <= thresholds], [0, 1], 2)
+    return pd.Categorical.from_codes(codes, APPLIES_CATEGORIES)
+
+
+# How the columns of salary_summaries combine when summaries of disjoint rows are merged.
+SUMMARY_MERGE = {'min_salary': 'min', 'max_salary': 'max', 'pair_sum': 'sum', 'pair_count': 'sum'}
+
+
+def salary_summaries(df):
+    """Return the sidebar's salary figures per (skill, state) of ``df``.
+
+    Lowest ``min_salary``, highest ``max_salary``, and the sum and count of
+    ``min_salary + max_salary`` over postings that have both. Summaries of
+    disjoint rows merge with :data:`SUMMARY_MERGE`.
+    """
+    both = df['min_salary'].notna() & df['max_salary'].notna()
+    summaries = pd.DataFrame({
+        'skill_name': df['skill_name'],
+        'state': df['state'],
+        'min_salary': df['min_salary'],
+        'max_salary': df['max_salary'],
+        'pair_sum': (df['min_salary'] + df['max_salary']).astype('float64').where(both, 0.0),
+        'pair_count': both,
+    })
+    return summaries.groupby(['skill_name', 'state'], observed=True, dropna=False).agg(SUMMARY_MERGE).reset_index()
+
+
+def group_compression(compression):
+    """Return the compression of a sketch group's own sketch, for merged sketches read at ``compression``."""
+    return compression / GROUP_COMPRESSION_RATIO
+
+
+def compress_groups(group_ids, means, weights, compression):
+    """:func:`~sketches.compress` the salaries of sketch groups for merged sketches read at ``compression``.
+
+    Groups of at most ``compression`` salaries keep them as they are; larger
+    groups are compressed at :func:`group_compression`.
+    """
+    return compress(group_ids, means, weights, group_compression(compression), exact_weight=compression)
+
+
+def _sketch_groups(df, compression):
+    # Salary sketch groups of the rows of df, with their centroids.
+    expanded = expand_salaries(df, keys=['skill_name', 'state', 'company_size_label'])
+    grouped = expanded.groupby(SKETCH_DIMENSIONS, observed=True, dropna=False)
+    codes = grouped.ngroup().to_numpy()
+    salaries = expanded['salary'].to_numpy(dtype='float64')
+    order = np.lexsort((salaries, codes))
+    codes, salaries = codes[order], salaries[order]
+    centroid_groups, means, weights = compress_groups(codes, salaries, np.ones(len(salaries)), compression)
+    return grouped['salary'].agg(['count', 'sum', 'min', 'max']).reset_index(), centroid_groups, means, weights
+
+
+class SalaryAggregates:
+    """Salary statistics for the sidebar and the salary box plot, built in one pass over the rows.
+
+    ``summaries`` holds the exact sidebar figures per (skill, state): lowest
+    ``min_salary``, highest ``max_salary`` and the sum and count of
+    ``min_salary + max_salary`` over postings that have both. ``groups`` holds one
+    :class:`~sketches.QuantileSketch` of the box plot's salaries per combination
+    of :data:`SKETCH_DIMENSIONS`, stored as slices of shared centroid arrays.
+    Both are merged on demand, so all-states or top-company-size views never
+    touch the rows. ``applies_thresholds`` holds the box plot's applies
+    cut-off per skill, computed with the groups; :meth:`size_applies_thresholds`
+    those per (skill, company size), computed on first use.
+    """
+
+    def __init__(self, df, compression=DEFAULT_COMPRESSION):
+        self.compression = compression
+        self._set_summaries(salary_summaries(df))
+        self._set_groups(*_sketch_groups(df, compression))
+
+    @classmethod
+    def from_parts(cls, summaries, groups, centroid_groups, means, weights, compression=DEFAULT_COMPRESSION):
+        """Build the aggregates from precomputed parts instead of the rows.
+
+        ``summaries`` is as the attribute of the same name. ``groups`` has one
+        row per sketch group, with the :data:`SKETCH_DIMENSIONS` and the group's
+        salary ``count``, ``sum``, ``min`` and ``max``; ``centroid_groups``
+        (positions in ``groups``, ascending), ``means`` and ``weights`` are the
+        groups' sketch centroids.
+        """
+        aggregates = cls.__new__(cls)
+        aggregates.compression = compression
+        aggregates._set_summaries(summaries)
+        aggregates._set_groups(groups, centroid_groups, means, weights)
+        return aggregates
+
+    def _set_summaries(self, summaries):
+        self.summaries = summaries
+        self._summary_index = RowIndex(summaries)
+
+    def _set_groups(self, groups, centroid_groups, means, weights):
+        self._means, self._weights = means, weights
+        self._offsets = np.searchsorted(centroid_groups, np.arange(len(groups) + 1))
+        self.groups = groups
+        self._group_index = RowIndex(self.groups)
+        self._group_stats = {column: self.groups[column].to_numpy() for column in ['count', 'sum', 'min', 'max']}
+        self.applies_thresholds = applies_thresholds(groups)
+        self._size_applies_thresholds = None
+
+    def appended(self, df):
+        """Return aggregates of these postings and the postings in ``df``.
+
+        The summaries and sketch groups of ``df`` are merged into copies of
+        these; only the groups ``df`` adds salaries to are recompressed, so the
+        cost follows the size of ``df`` and the number of groups, not the number
+        of postings. Merged sketches carry the usual sketch error. This object is
+        left as it was, for readers still using it.
+        """
+        summaries = merge_tables(
+            unify_categories([self.summaries, salary_summaries(df)], ['skill_name', 'state']),
+            ['skill_name', 'state'], SUMMARY_MERGE,
+        )
+
+        delta, delta_centroid_groups, delta_means, delta_weights = _sketch_groups(df, self.compression)
+        grouped = pd.concat(unify_categories([self.groups, delta], ['skill_name', 'state']), ignore_index=True).groupby(
+            SKETCH_DIMENSIONS, observed=True, dropna=False)
+        positions = grouped.ngroup().to_numpy()
+        old_positions, delta_positions = positions[:len(self.groups)], positions[len(self.groups):]
+        kept = np.repeat(old_positions, np.diff(self._offsets))
+        touched = np.isin(kept, delta_positions)
+        centroid_groups = np.concatenate([kept[touched], delta_positions[delta_centroid_groups]])
+        means = np.concatenate([self._means[touched], delta_means])
+        weights = np.concatenate([self._weights[touched], delta_weights])
+        order = np.lexsort((means, centroid_groups))
+        centroid_groups, means, weights = compress_groups(
+            centroid_groups[order], means[order], weights[order], self.compression)
+
+        # Untouched groups keep their centroids as they are; recompressing them
+        # on every append would keep eroding their accuracy.
+        centroid_groups = np.concatenate([kept[~touched], centroid_groups])
+        order = np.argsort(centroid_groups, kind='stable')
+        aggregates = SalaryAggregates.__new__(SalaryAggregates)
+        aggregates.compression = self.compression
+        aggregates._set_summaries(summaries)
+        aggregates._set_groups(
+            grouped.agg(GROUP_MERGE).reset_index(),
+            centroid_groups[order],
+            np.concatenate([self._means[~touched], means])[order],
+            np.concatenate([self._weights[~touched], weights])[order],
+        )
+        return aggregates
+
+    def size_applies_thresholds(self):
+        """Return the applies cut-offs per (skill, company size), computed on first use and kept."""
+        if self._size_applies_thresholds is None:
+            self._size_applies_thresholds = applies_thresholds(self.groups, per_size=True)
+        return self._size_applies_thresholds
+
+    def summary(self, skill=None, state=None):
+        """Return the sidebar's min, average and max salary for the selection (``None`` matches all)."""
+        rows = self.summaries.iloc[self._summary_index.rows(skill, state)]
+        pair_count = rows['pair_count'].sum()
+        return {
+            'min_salary': rows['min_salary'].min(),
+            'avg_salary': rows['pair_sum'].sum() / pair_count / 2 if pair_count else np.nan,
+            'max_salary': rows['max_salary'].max(),
+        }
+
+    def merged(self, groups):
+        """Merge the sketches of ``groups`` (positions in ``groups``) into one.
+
+        The merged sketch keeps every salary while there are at most
+        ``compression`` of them, so its quantiles are exact.
+        """
+        groups = np.asarray(groups)
+        starts, stops = self._offsets[groups], self._offsets[groups + 1]
+        lengths = stops - starts
+        centroids = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(lengths.sum())
+        means, weights = self._means[centroids], self._weights[centroids]
+        order = np.argsort(means, kind='stable')
+        _, means, weights = compress(
+            np.zeros(len(means), dtype=np.int64), means[order], weights[order], self.compression,
+            exact_weight=self.compression,
+        )
+        stats = self._group_stats
+        return QuantileSketch(
+            means, weights, int(stats['count'][groups].sum()), float(stats['sum'][groups].sum()),
+            float(stats['min'][groups].min()), float(stats['max'][groups].max()), self.compression,
+        )
+
+    def box_statistics(self, skill, n_sizes=3, per_size=False):
+        """Return the salary box plot summary for ``skill``.
+
+        One row per box, by ``applies_category`` and ``company_size_label``,
+        restricted to the ``n_sizes`` best-paying company sizes, with the box's
+        ``count``, ``min``, ``q1``, ``median``, ``q3`` and ``max``. Applies are
+        bucketed by the skill's threshold or, with ``per_size``, by that of the
+        skill at each company size. Counts, mins and maxes are exact, as are the
+        quartiles of boxes of at most ``compression`` salaries, which Plotly
+        would draw from the raw values (``quartilemethod='linear'``); those of
+        larger boxes come from the merged sketches.
+        """
+        positions = self._group_index.rows(skill=skill)
+        groups = self.groups.iloc[positions]
+        sizes = top_company_sizes(groups.groupby('company_size_label', observed=True)['max'].max(), n_sizes)
+        in_sizes = groups['company_size_label'].isin(sizes).to_numpy()
+        groups, positions = groups[in_sizes], positions[in_sizes]
+        if per_size:
+            sizes_of_skill = pd.MultiIndex.from_arrays(
+                [np.full(len(groups), skill, dtype=object), groups['company_size_label'].astype(object)])
+            threshold = self.size_applies_thresholds().reindex(sizes_of_skill).to_numpy()
+        else:
+            threshold = self.applies_thresholds.get(skill, np.nan)
+        groups = groups.assign(applies_category=categorize_applies(groups['applies'].to_numpy(), threshold))
+        rows = []
+        boxes = groups.groupby(['applies_category', 'company_size_label'], observed=True).indices
+        for (applies_category, company_size), members in boxes.items():
+            sketch = self.merged(positions[members])
+            q1, median, q3 = sketch.quantile([0.25, 0.5, 0.75])
+            rows.append((applies_category, company_size, sketch.count, sketch.min, q1, median, q3, sketch.max))
+        columns = ['applies_category', 'company_size_label', 'count', 'min', 'q1', 'median', 'q3', 'max']
+        return pd.DataFrame(rows, columns=columns), sizes
+
+    @property
+    def nbytes(self):
+        """Memory held by the sketch centroids."""
+        return self._means.nbytes + self._weights.nbytes + self._offsets.nbytes
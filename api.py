@@ -0,0 +1,267 @@
+"""A JSON API over the dashboard's aggregates, for tools that need its numbers without rendering it.
+
+    python api.py [--host 127.0.0.1] [--port 8502] [--csv main_df_subset.csv]
+
+Loads the export the way the dashboard does, through a :class:`~deltas.LiveDataset`
+that picks up a replaced export and queued deltas, and answers GET requests
+through the dashboard's own :class:`~views.Views` data methods, so both show
+the same numbers:
+
+- ``/skills``: the skills and states that can be selected;
+- ``/summary?skill=&state=``: the sidebar's salary statistics, job count and
+  top companies (for the skill in every state when it has no postings in the state);
+- ``/state-counts?skill=``: the choropleth's job count per state;
+- ``/skill-flows?state=[&top_n=5]``: the Sankey's top skills and their
+  experience-level flows;
+- ``/top-companies?skill=&state=[&work_type=][&n=5]``: the top-companies chart,
+  with the selection it falls back to and its work types (the first by default);
+- ``/salary-box?skill=``: the salary box plot's statistics.
+
+Every response carries an ``ETag`` derived from the dataset version and the
+query, so a request with a matching ``If-None-Match`` is answered ``304 Not
+Modified`` without its body, and bodies are cached until the dataset changes.
+Invalid requests are answered ``400`` or ``404`` whatever their
+``If-None-Match``, and unexpected failures ``500``, each with an ``error``
+message. Requests are served on threads, one per connection, with keep-alive.
+"""
+import argparse
+import hashlib
+import json
+import math
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+
+import ingest
+from deltas import LiveDataset, watch_interval_from_env
+from figure_cache import FigureCache
+from postings import DATA_PATH, state_mapping
+from views import DEFAULT_TOP_COMPANIES, DEFAULT_TOP_SKILLS, Views
+
+DEFAULT_PORT = 8502
+# Memory budget of the cached response bodies.
+BODY_CACHE_BYTES = 32 * 2**20
+
+
+class ApiError(Exception):
+    """A request the API cannot answer, with the HTTP ``status`` to answer it with."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _value(value):
+    # Numbers as JSON has them: numpy scalars as Python ones, NaN as null.
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def _records(frame):
+    columns = list(frame.columns)
+    return [dict(zip(columns, map(_value, row))) for row in frame.itertuples(index=False, name=None)]
+
+
+def _choice(params, name, choices, default=None):
+    value = params.get(name, default)
+    if value is None:
+        raise ApiError(400, f'missing parameter: {name}')
+    if value not in choices:
+        raise ApiError(400, f'unknown {name}: {value}')
+    return value
+
+
+def _count(params, name, default, maximum):
+    try:
+        value = int(params.get(name, default))
+    except ValueError:
+        raise ApiError(400, f'{name} must be an integer')
+    if not 1 <= value <= maximum:
+        raise ApiError(400, f'{name} must be between 1 and {maximum}')
+    return value
+
+
+def skills(views, params):
+    return {'skills': list(views.count_cube.skills), 'states': list(state_mapping)}
+
+
+def summary(views, params):
+    skill = _choice(params, 'skill', views.count_cube.skills)
+    state = _choice(params, 'state', state_mapping)
+    numbers = views.selection_summary(skill, state)
+    top_companies = numbers.pop('top_companies')
+    return {
+        **{name: _value(value) for name, value in numbers.items()},
+        'top_companies': [
+            {'company_name': company, 'job_count': _value(count)} for company, count in top_companies.items()
+        ],
+    }
+
+
+def state_counts(views, params):
+    skill = _choice(params, 'skill', views.count_cube.skills)
+    return {'skill': skill, 'state_counts': _records(views.state_counts(skill))}
+
+
+def skill_flows(views, params):
+    state = _choice(params, 'state', state_mapping)
+    top_n = _count(params, 'top_n', min(DEFAULT_TOP_SKILLS, len(views.count_cube.skills)), len(views.count_cube.skills))
+    top_skills, flows = views.skill_flows(state, top_n)
+    return {'state': state, 'top_skills': top_skills, 'flows': _records(flows)}
+
+
+def top_companies(views, params):
+    skill = _choice(params, 'skill', views.count_cube.skills)
+    state = _choice(params, 'state', state_mapping)
+    n = _count(params, 'n', DEFAULT_TOP_COMPANIES, views.count_cube.top_companies().k)
+    selection, filter_use = views.bar_selection(skill, state)
+    work_types = list(views.work_types(selection))
+    if not work_types:
+        raise ApiError(404, 'no postings to rank companies by')
+    work_type = _choice(params, 'work_type', work_types, default=work_types[0])
+    return {
+        'selection': {'skill': selection[0], 'state': selection[1], 'filter_use': filter_use},
+        'work_types': work_types,
+        'work_type': work_type,
+        'companies': _records(views.company_breakdown(selection, work_type, n)),
+    }
+
+
+def salary_box(views, params):
+    skill = _choice(params, 'skill', views.count_cube.skills)
+    stats, sizes = views.salary_statistics(skill)
+    return {'skill': skill, 'company_sizes': list(sizes), 'boxes': _records(stats)}
+
+
+# Each endpoint's parameters and the function answering it.
+ENDPOINTS = {
+    '/skills': ((), skills),
+    '/summary': (('skill', 'state'), summary),
+    '/state-counts': (('skill',), state_counts),
+    '/skill-flows': (('state', 'top_n'), skill_flows),
+    '/top-companies': (('skill', 'state', 'work_type', 'n'), top_companies),
+    '/salary-box': (('skill',), salary_box),
+}
+
+
+def render(views, path, params):
+    """Return the JSON body answering ``path`` with ``params`` (as :func:`parse_request` returns them)."""
+    payload = ENDPOINTS[path][1](views, dict(params))
+    return json.dumps(payload, separators=(',', ':'), allow_nan=False).encode()
+
+
+def parse_request(target):
+    """Return the endpoint and parameters of the request ``target``, with the parameters in a canonical order."""
+    url = urlsplit(target)
+    if url.path not in ENDPOINTS:
+        raise ApiError(404, f'unknown endpoint: {url.path}')
+    allowed, _ = ENDPOINTS[url.path]
+    params = dict(parse_qsl(url.query, keep_blank_values=True))
+    unknown = sorted(set(params) - set(allowed))
+    if unknown:
+        raise ApiError(400, f'unknown parameters: {", ".join(unknown)}')
+    return url.path, tuple(sorted(params.items()))
+
+
+def etag(dataset_key, path, params):
+    """Return the strong ETag of the response to ``path`` and ``params`` for the dataset version ``dataset_key``."""
+    digest = hashlib.blake2b(repr((dataset_key, path, params)).encode(), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+
+def _matches(if_none_match, tag):
+    if if_none_match is None:
+        return False
+    tags = [candidate.strip().removeprefix('W/') for candidate in if_none_match.split(',')]
+    return '*' in tags or tag in tags
+
+
+class AggregateServer(ThreadingHTTPServer):
+    """HTTP server answering :data:`ENDPOINTS` from ``dataset``, a :class:`~deltas.LiveDataset`."""
+
+    daemon_threads = True
+
+    def __init__(self, address, dataset, body_cache_bytes=BODY_CACHE_BYTES):
+        super().__init__(address, Handler)
+        self.dataset = dataset
+        # Bodies by ETag, which already names the dataset version.
+        self.bodies = FigureCache(body_cache_bytes, sizeof=len)
+
+    def respond(self, target, if_none_match=None):
+        """Return ``(status, ETag, body)`` for the request ``target``; the body is ``None`` when not modified."""
+        path, params = parse_request(target)
+        version = self.dataset.current
+        tag = etag(version.key, path, params)
+
+        def build():
+            return render(Views(version.count_cube, version.salary_aggregates, None, version.key), path, params)
+
+        # The body is looked up (or built) first, so a request the endpoint
+        # rejects raises its ApiError rather than matching ``If-None-Match: *``.
+        body = self.bodies.get_or_build(tag, build)
+        if _matches(if_none_match, tag):
+            return 304, tag, None
+        return 200, tag, body
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in two writes; without this, a keep-alive
+    # client's delayed ACK holds the body back by tens of milliseconds.
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        try:
+            status, tag, body = self.server.respond(self.path, self.headers.get('If-None-Match'))
+        except ApiError as error:
+            status, tag, body = error.status, None, json.dumps({'error': str(error)}).encode()
+        except Exception:
+            # Answered rather than left to handle_error, which would drop the
+            # keep-alive connection without a response; the traceback still
+            # goes to stderr.
+            traceback.print_exc()
+            status, tag, body = 500, None, json.dumps({'error': 'internal error'}).encode()
+        self.send_response(status)
+        if tag is not None:
+            self.send_header('ETag', tag)
+            # Clients may keep responses, but must revalidate: a delta changes the numbers.
+            self.send_header('Cache-Control', 'no-cache')
+        if body is not None:
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body is not None:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # One line per request on stderr would cost more than most answers.
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on (default: %(default)s)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='port to listen on (default: %(default)s)')
+    parser.add_argument('--csv', default=DATA_PATH, help='export to serve (default: %(default)s)')
+    parser.add_argument('--max-memory', type=ingest.parse_size, default=ingest.max_memory_from_env(),
+                        help='stream the CSV within this many bytes, e.g. 512M (default: $VISU_MAX_MEMORY)')
+    args = parser.parse_args(argv)
+
+    dataset = LiveDataset(args.csv, max_memory=args.max_memory).watch(watch_interval_from_env())
+    server = AggregateServer((args.host, args.port), dataset)
+    print(f'Serving {args.csv} on http://{args.host}:{server.server_address[1]}/')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
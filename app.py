@@ -538,12 +538,16 @@
 
 
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 import base64
 
-df = pd.read_csv('main_df_subset.csv')
+import ingest
+import instrumentation
+import timing
+import warmup
+from deltas import LiveDataset, watch_interval_from_env
+from figure_cache import FigureCache, figure_nbytes
+from postings import DATA_PATH, state_mapping
+from views import DEFAULT_TOP_COMPANIES, DEFAULT_TOP_SKILLS, Views
 
 st.set_page_config(
     page_title="Skills Analysis: Job Market Insights",
@@ -563,51 +567,65 @@ st.markdown(f"""
     </div>
     """, unsafe_allow_html=True)
 
-df = pd.read_csv('main_df_subset.csv')
-
-state_mapping = {
-    'NJ': 'New Jersey', 'IL': 'Illinois', 'NY': 'New York', 'CA': 'California', 'PA': 'Pennsylvania', 
-    'WI': 'Wisconsin', 'WA': 'Washington', 'NC': 'North Carolina', 'OH': 'Ohio', 'GA': 'Georgia', 
-    'KY': 'Kentucky', 'FL': 'Florida', 'MD': 'Maryland', 'TX': 'Texas', 'VA': 'Virginia', 
-    'MI': 'Michigan', 'SD': 'South Dakota', 'IN': 'Indiana', 'NE': 'Nebraska', 'MO': 'Missouri', 
-    'MA': 'Massachusetts', 'TN': 'Tennessee', 'LA': 'Louisiana', 'DC': 'District of Columbia', 
-    'AR': 'Arkansas', 'OK': 'Oklahoma', 'UT': 'Utah', 'MN': 'Minnesota', 'AZ': 'Arizona', 'CT': 'Connecticut', 
-    'RI': 'Rhode Island', 'ME': 'Maine', 'NH': 'New Hampshire', 'CO': 'Colorado', 'AL': 'Alabama', 
-    'KS': 'Kansas', 'ID': 'Idaho', 'HI': 'Hawaii', 'OR': 'Oregon', 'NV': 'Nevada', 'NM': 'New Mexico', 
-    'VT': 'Vermont', 'IA': 'Iowa', 'SC': 'South Carolina', 'DE': 'Delaware', 'ND': 'North Dakota', 
-    'MS': 'Mississippi', 'WY': 'Wyoming', 'MT': 'Montana', 'AK': 'Alaska'
-}
-
-# Reverse mapping for filtering purposes
-reverse_state_mapping = {v: k for k, v in state_mapping.items()}
-
-df_filtered_state = df.copy()
-df_filtered_state['state'] = df_filtered_state['state'].replace(state_mapping)
-df_filtered_state = df_filtered_state[df_filtered_state['state'].isin(state_mapping.values())]
-df['state_full_name'] = df['state'].replace(state_mapping)
+@st.cache_resource(show_spinner=False)
+def live_dataset():
+    # One dataset per process, shared read-only by every session. Its
+    # aggregates come from the on-disk snapshot when it matches the data, so a
+    # restart does not read the postings; with VISU_MAX_MEMORY set, a rebuild
+    # streams the export within that budget. A background thread reloads a
+    # replaced export and folds in deltas queued with `python deltas.py add`,
+    # then swaps the new version in: no session waits for a rebuild.
+    return LiveDataset(DATA_PATH, max_memory=ingest.max_memory_from_env()).watch(watch_interval_from_env())
+
+
+@st.cache_resource(show_spinner=False)
+def figure_cache():
+    # Built figures shared by every session, keyed on their inputs and the
+    # dataset signature. Streamlit only serializes a figure it is given, so
+    # cached figures are never modified.
+    return FigureCache()
+
+
+def show_figure(fig, **kwargs):
+    st.plotly_chart(fig, **kwargs)
+    # Serializing the figure again is only worth it when someone reads the size.
+    if timing.active():
+        timing.note(figure_bytes=figure_nbytes(fig))
+
+
+instrumented = instrumentation.session_enabled()
+if instrumented:
+    instrumentation.install()
+    instrumentation.begin_run()
+
+
+# Each rerun reads the current version once and keeps it to the end, so a
+# version swapped in meanwhile shows from the next rerun on, and an old version
+# is freed once the last rerun holding it is done.
+with timing.timed('data_load'):
+    dataset = live_dataset().current
+    count_cube, salary_aggregates = dataset.count_cube, dataset.salary_aggregates
+    views = Views(count_cube, salary_aggregates, figure_cache(), dataset.key)
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def start_warmup(path, mtime_ns, size, version):
+    # Started once per dataset version and left running in its own threads; reruns only
+    # read its progress.
+    return warmup.Warmup(warmup.view_tasks(views, count_cube.skills, list(state_mapping))).start()
+
+
+if warmup.enabled():
+    view_warmup = start_warmup(*dataset.key)
+
 if 'selected_state' not in st.session_state:
     st.session_state.selected_state = 'CA' 
-     
-# Company size mapping
-company_size_mapping = {
-    1.0: '2-50 employees',
-    2.0: '51-200 employees',
-    3.0: '201-500 employees',
-    4.0: '501-1000 employees',
-    5.0: '1001-5000 employees',
-    6.0: '5001-10,000 employees',
-    7.0: '10,001+ employees'
-    }
-df['company_size_label'] = df['company_size'].map(company_size_mapping)
-df['company_size_label'] = pd.Categorical(df['company_size_label'], categories=[
-    '2-50 employees', '51-200 employees', '201-500 employees', '501-1000 employees',
-    '1001-5000 employees', '5001-10,000 employees', '10,001+ employees'], ordered=True)
 
 ########################Side Bar#################################
 
 with st.sidebar:
     st.sidebar.title("Search Filters")
-    unique_skill_names = df['skill_name'].dropna().unique()
+    unique_skill_names = count_cube.skills
     selected_skill_name = st.sidebar.selectbox('Select Skill:', unique_skill_names, key='skill_select')
     unique_states = list(state_mapping.keys())
     selected_state_abbreviation = st.sidebar.selectbox(
@@ -618,205 +636,93 @@ with st.sidebar:
     )
     st.session_state.selected_state = selected_state_abbreviation
     selected_state_full_name = state_mapping[selected_state_abbreviation]
+    if warmup.enabled():
+        status = 'done' if view_warmup.finished else 'running'
+        st.sidebar.caption(
+            f"Warm-up {status}: {view_warmup.done}/{view_warmup.total} views in {view_warmup.elapsed:.1f} s"
+        )
 
 
-filtered_df_skill_state = df[(df['skill_name'] == selected_skill_name) & (df['state'] == selected_state_abbreviation)]
-
-
-if not filtered_df_skill_state.empty:
-    min_salary = filtered_df_skill_state['min_salary'].min()
-    max_salary = filtered_df_skill_state['max_salary'].max()
-    avg_salary = (filtered_df_skill_state['min_salary'] + filtered_df_skill_state['max_salary']).mean() / 2
-    st.sidebar.subheader(f'Salary Statistics for {selected_skill_name} in {selected_state_abbreviation}')
-    st.sidebar.write(f"Minimum Salary: ${min_salary:,.2f}")
-    st.sidebar.write(f"Average Salary: ${avg_salary:,.2f}")
-    st.sidebar.write(f"Maximum Salary: ${max_salary:,.2f}")
-
-    num_job_postings = filtered_df_skill_state.shape[0]  
-    st.sidebar.subheader(f'Number of Job Postings for {selected_skill_name} in {selected_state_abbreviation}')
-    st.sidebar.write(f"Total: {num_job_postings}")  
-    top_5_companies = filtered_df_skill_state['company_name'].value_counts().head(5)
-    
-    st.sidebar.subheader(f'Top Companies in {selected_state_abbreviation} for {selected_skill_name}')
-    for company, count in top_5_companies.items():
-        st.sidebar.write(f"{company}: {count} job postings")
-else:
-    state_filtered = df[df['skill_name'] == selected_skill_name]
-    min_salary = state_filtered['min_salary'].min()
-    max_salary = state_filtered['max_salary'].max()
-    avg_salary = (state_filtered['min_salary'] + filtered_df_skill_state['max_salary']).mean() / 2
-
-    st.sidebar.subheader(f'Salary Statistics for {selected_skill_name}')
-    st.sidebar.write(f"Minimum Salary: ${min_salary:,.2f}")
-    st.sidebar.write(f"Average Salary: ${avg_salary:,.2f}")
-    st.sidebar.write(f"Maximum Salary: ${max_salary:,.2f}")
-
-    num_job_postings = state_filtered.shape[0]  
-    st.sidebar.subheader(f'Number of Job Postings in {selected_skill_name}')
-    st.sidebar.write(f"Total: {num_job_postings}")  
-    top_5_companies = state_filtered['company_name'].value_counts().head(5)
-    
-    st.sidebar.subheader(f'Top Companies in {selected_skill_name}')
-    for company, count in top_5_companies.items():
-        st.sidebar.write(f"{company}: {count} job postings")
-
-#########################COL########################
-row1_col1, row1_col2 = st.columns(2)
+with timing.timed('sidebar'):
+    selection_summary = views.selection_summary(selected_skill_name, selected_state_abbreviation)
+    min_salary = selection_summary['min_salary']
+    max_salary = selection_summary['max_salary']
+    avg_salary = selection_summary['avg_salary']
+    num_job_postings = selection_summary['job_count']
+    top_5_companies = selection_summary['top_companies']
+    if selection_summary['state'] is not None:
+        st.sidebar.subheader(f'Salary Statistics for {selected_skill_name} in {selected_state_abbreviation}')
+        st.sidebar.write(f"Minimum Salary: ${min_salary:,.2f}")
+        st.sidebar.write(f"Average Salary: ${avg_salary:,.2f}")
+        st.sidebar.write(f"Maximum Salary: ${max_salary:,.2f}")
+
+        st.sidebar.subheader(f'Number of Job Postings for {selected_skill_name} in {selected_state_abbreviation}')
+        st.sidebar.write(f"Total: {num_job_postings}")
+
+        st.sidebar.subheader(f'Top Companies in {selected_state_abbreviation} for {selected_skill_name}')
+        for company, count in top_5_companies.items():
+            st.sidebar.write(f"{company}: {count} job postings")
+    else:
+        st.sidebar.subheader(f'Salary Statistics for {selected_skill_name}')
+        st.sidebar.write(f"Minimum Salary: ${min_salary:,.2f}")
+        st.sidebar.write(f"Average Salary: ${avg_salary:,.2f}")
+        st.sidebar.write(f"Maximum Salary: ${max_salary:,.2f}")
+
+        st.sidebar.subheader(f'Number of Job Postings in {selected_skill_name}')
+        st.sidebar.write(f"Total: {num_job_postings}")
+
+        st.sidebar.subheader(f'Top Companies in {selected_skill_name}')
+        for company, count in top_5_companies.items():
+            st.sidebar.write(f"{company}: {count} job postings")
+
+# Each section is a fragment whose arguments are the selections it reads. A
+# widget inside a section reruns only that section; changing the skill or state
+# in the sidebar reruns the whole script, and with it every section.
 
-#########################COL 1########################
-
-with row1_col1:
 ########################MAP PLOT#################################
-
-    filtered_df = df[df['skill_name'] == selected_skill_name]
-
-    state_job_counts = filtered_df.groupby('state')['job_id'].count().reset_index()
-    state_job_counts.columns = ['state', 'job_count']
-
-    min_job_count = state_job_counts['job_count'].min()
-    max_job_count = state_job_counts['job_count'].max()
-    num_bins = 3
-    if max_job_count == min_job_count:
-        max_job_count += 1
-    color_ranges = pd.cut(state_job_counts['job_count'], bins=num_bins, retbins=True)[1]
-
-    def format_label(value):
-        if value >= 1000:
-            return f'{int(round(value/1000))}K'
-        else:
-            return f'{int(value)}'
-        
-    labels = [f'{(format_label(color_ranges[i]))} - {(format_label(color_ranges[i+1]))}' for i in range(len(color_ranges) - 1)]
-    state_job_counts['color_label'] = pd.cut(state_job_counts['job_count'],
-                                            bins=color_ranges,
-                                            labels=labels,
-                                            include_lowest=True)
-    colors = [ '#deebf7', '#6baed6','#3182bd',
-    ]
-    color_map = {label: colors[i] for i, label in enumerate(labels)}
-
-    state_job_counts['color'] = state_job_counts['color_label'].map(color_map)
-
-    ticktext = labels
-    tickvals = list(range(len(labels)))
-
-    fig = px.choropleth(
-        state_job_counts,
-        locations='state',
-        locationmode='USA-states',
-        color='color_label', 
-        scope='usa',
-        color_discrete_map=color_map,  
-        labels={'job_count': 'Job Count', 'color_label': 'Job Count Range'},  
-        category_orders={"color_label": labels}  
-    )
-    fig.update_geos(projection_type="albers usa")
-    fig.update_traces(
-        hovertemplate='<b>%{location}</b><br>Job Count=%{customdata[0]}<extra></extra>',
-        customdata=state_job_counts[['job_count', 'state']]
-    )
-
-    fig.update_layout(coloraxis_colorbar=dict(
-        title="Open Jobs",
-        tickvals=tickvals,
-        ticktext=ticktext,
-        lenmode="pixels", len=300, yanchor="top", y=1,
-        ticks="outside"
-    ))
+@st.fragment
+@timing.timed('choropleth')
+def state_map_section(selected_skill_name):
+    fig = views.choropleth(selected_skill_name)
     st.markdown(f'##### Skill Distribution in Job Postings for {selected_skill_name} across the USA')
 
-    st.plotly_chart(fig)
+    show_figure(fig)
 
 ########################SNAKEY PLOT#######################
-with row1_col2:
-    state_filtered = df[df['state'] == selected_state_abbreviation]
-    top_skills = state_filtered['skill_name'].value_counts()
-    top_skills = top_skills[top_skills.index != 'other'].head(5).index.tolist()
-    state_filtered = state_filtered[state_filtered['skill_name'].isin(top_skills)]
-    all_labels = list(set(state_filtered['skill_name']).union(set(state_filtered['formatted_experience_level'])))
-    label_to_index = {label: i for i, label in enumerate(all_labels)}
-    source = []
-    target = []
-    value = []
-    skills_to_exp = state_filtered.groupby(['skill_name', 'formatted_experience_level']).size().reset_index(name='count')
-    for _, row in skills_to_exp.iterrows():
-        source.append(label_to_index[row['skill_name']])
-        target.append(label_to_index[row['formatted_experience_level']])
-        value.append(row['count'])
-    skill_colors = ['#D3F4FF', '#B2DFFB', '#B1E8ED', '#C6CBEF', '#CDFFEB']
-    skill_color_map = {skill: skill_colors[i] for i, skill in enumerate(top_skills)}
-    node_colors = []
-    for label in all_labels:
-        if label in skill_color_map:
-            node_colors.append(skill_color_map[label])
-        else:
-            node_colors.append("rgba(0, 0, 0, 0.1)")  # Light grey for other nodes
-    link_colors = []
-    for _, row in skills_to_exp.iterrows():
-        link_colors.append(skill_color_map[row['skill_name']])
-    fig = go.Figure(data=[go.Sankey(
-        node=dict(
-            pad=15,
-            thickness=20,
-            line=dict(color="black", width=0.5),
-            label=all_labels,
-            color=node_colors
-        ),
-        link=dict(
-            source=source,
-            target=target,
-            value=value,
-            color=link_colors
-        )
-    )])
+@st.fragment
+@timing.timed('sankey')
+def skill_flow_section(selected_skill_name, selected_state_abbreviation, selected_state_full_name):
+    sankey_top_n = st.number_input(
+        'Top skills', min_value=1, max_value=len(count_cube.skills),
+        value=min(DEFAULT_TOP_SKILLS, len(count_cube.skills)), key='sankey_top_n'
+    )
+    fig = views.sankey(selected_state_abbreviation, sankey_top_n)
     st.markdown(f"##### Skill Distribution in Job Postings for {selected_skill_name} in {selected_state_full_name}")
 
 
-    st.plotly_chart(fig)
+    show_figure(fig)
 
-
-#########################COL 2########################
-row2_col1, row2_col2 = st.columns(2)
 ######################## BAR CHART #######################
-with row2_col2:
-
+@st.fragment
+@timing.timed('top_companies')
+def top_companies_section(selected_skill_name, selected_state_abbreviation, selected_state_full_name):
     col1, col2 = st.columns([4, 1])
-    filtered_df_skill = df[df['skill_name'] == selected_skill_name]
-
-    filtered_df_state = filtered_df_skill[filtered_df_skill['state'] == selected_state_abbreviation]
-    unique_companies = filtered_df_state['company_name'].nunique()
-
-    filter_use = "both"
-    if filtered_df_state.empty:
-        if not filtered_df_skill.empty:
-            filtered_df_state = filtered_df_skill
-            filter_use = "skill"
-        else:
-            filtered_df_state = df[df['state'] == selected_state_abbreviation]
-            filter_use = "state"
-            if filtered_df_state.empty:
-                filtered_df_state = df
-                filter_use = "Not Both"
-                
-    if unique_companies ==1:
-        if not filtered_df_skill.empty and filtered_df_skill['company_name'].nunique() !=1:
-            filtered_df_state = filtered_df_skill
-            filter_use = "skill"
-        else:
-            filtered_df_state = df[df['state'] == selected_state_abbreviation]
-            if filtered_df_state['company_name'].nunique() !=1:
-                filtered_df_state = df[df['state'] == selected_state_abbreviation]
-                filter_use = "state"
-
-    available_work_types = filtered_df_state['formatted_work_type'].unique()
+    # The bar chart's selection as a (skill, state) pair; None matches every value.
+    bar_selection, filter_use = views.bar_selection(selected_skill_name, selected_state_abbreviation)
+
+    available_work_types = views.work_types(bar_selection)
     if 'selected_work_type' not in st.session_state:
-        st.session_state.selected_work_type = available_work_types[0] if available_work_types.size > 0 else None
+        st.session_state.selected_work_type = available_work_types[0] if len(available_work_types) > 0 else None
 
     with col2:
+        top_companies_n = st.number_input(
+            'Top companies', min_value=1, max_value=count_cube.top_companies().k,
+            value=DEFAULT_TOP_COMPANIES, key='top_companies_n'
+        )
         selected_work_type = st.radio(
             "Select Work Type",
             available_work_types,
-            index=0 if st.session_state.selected_work_type is None else available_work_types.tolist().index(st.session_state.selected_work_type)
+            index=0 if st.session_state.selected_work_type is None else available_work_types.index(st.session_state.selected_work_type)
         )
 
         st.session_state.selected_work_type = selected_work_type
@@ -824,99 +730,45 @@ with row2_col2:
     selected_work_type = st.session_state.selected_work_type
 
     with col1:
-        filtered_df = filtered_df_state[filtered_df_state['formatted_work_type'].isin([selected_work_type])]
-        company_experience_data = filtered_df.groupby(['company_name', 'formatted_experience_level']).size().reset_index(name='job_count')
-        top_5_companies = company_experience_data.groupby('company_name')['job_count'].sum().nlargest(5).index
-        top_5_data = company_experience_data[company_experience_data['company_name'].isin(top_5_companies)]
-        top_5_data = top_5_data.sort_values('job_count', ascending=False)
-        color_map = {
-            "Internship": "#DAE1E7",
-            "Entry level": "#AEDADD",
-            "Associate": "#9ecae1",
-            "Mid-Senior level": "#6baed6",
-            "Director": "#3182bd",
-            "Executive": "#08519c"
-        }
-        fig3 = px.bar(
-            top_5_data,
-            x='company_name',
-            y='job_count',
-            color='formatted_experience_level',
-            labels={'job_count': 'Job Count', 'company_name': 'Company', 'formatted_experience_level': 'Experience Level'},
-            barmode='stack',
-            color_discrete_map=color_map,
-            category_orders={
-                'formatted_experience_level': ["Internship", "Entry level", "Associate", "Mid-Senior level", "Director", "Executive"]
-            },
-            hover_data={'company_name': False}
-        )
-        fig3.update_layout(
-            xaxis=dict(
-                title='Company',
-                tickangle=-45,
-                automargin=True,
-            ),
-            yaxis=dict(
-                title='Job Count',
-                range=[0, top_5_data['job_count'].max() + 10]
-            )
-        )
-        if filter_use is "both":
+        fig3 = views.top_companies(bar_selection, selected_work_type, top_companies_n)
+        if filter_use == "both":
             st.markdown(f"##### Top Companies for {selected_skill_name} in {selected_state_full_name}:Distribution by Experience Level of {selected_work_type}")
-        if filter_use is "skill":
+        if filter_use == "skill":
             st.markdown(f"##### Top Companies for {selected_skill_name} :Distribution by Experience Level of {selected_work_type}")
-        if filter_use is "state":
+        if filter_use == "state":
             st.markdown(f"##### Top Companies in {selected_state_full_name}: Distribution by Experience Level of {selected_work_type}")
-        if filter_use is "Not Both":
+        if filter_use == "Not Both":
             st.markdown(f"##### Top Companies : Distribution by Experience Level of {selected_work_type}")
-        st.plotly_chart(fig3, use_container_width=True)
+        show_figure(fig3, use_container_width=True)
+
 
-    
 ########################BOX PLOT #######################
+@st.fragment
+@timing.timed('salary_box')
+def box_plot(selected_skill_name):
+    fig = views.salary_box(selected_skill_name)
+    st.markdown(f"##### Salary Distribution by top 3 Company Size for {selected_skill_name}")
+    show_figure(fig)
+
+
+#########################COL########################
+row1_col1, row1_col2 = st.columns(2)
+
+#########################COL 1########################
+with row1_col1:
+    state_map_section(selected_skill_name)
+
+with row1_col2:
+    skill_flow_section(selected_skill_name, selected_state_abbreviation, selected_state_full_name)
+
+#########################COL 2########################
+row2_col1, row2_col2 = st.columns(2)
+with row2_col2:
+    top_companies_section(selected_skill_name, selected_state_abbreviation, selected_state_full_name)
+
 with row2_col1:
-    def box_plot(df, selected_skill_name):
-        filter_box = df[df['skill_name'] == selected_skill_name]
-        filter_box['salary'] = df.apply(lambda row: [row['min_salary'], row['max_salary']], axis=1)
-        df_expanded = filter_box.explode('salary')
-        df_expanded['salary'] = pd.to_numeric(df_expanded['salary'], errors='coerce')
-        df_expanded['applies'] = pd.to_numeric(df_expanded['applies'], errors='coerce')
-        df_expanded = df_expanded.dropna(subset=['salary', 'applies'])
-
-        top_company_sizes = df_expanded.groupby('company_size_label')['salary'].max().nlargest(3).index.tolist()
-        company_size_sorted = sorted(top_company_sizes, key=lambda x: list(company_size_mapping.values()).index(x))
-
-        df_expanded = df_expanded[df_expanded['company_size_label'].isin(company_size_sorted)]
-
-        applies_description = df_expanded['applies'].describe()
-        def categorize_applies(x):
-            if x == 0:
-                return 'No\nApplications'
-            elif x <= applies_description['75%']:
-                return 'Average\nApplications'
-            else:
-                return 'Above Average\nApplications'
-        df_expanded['applies_category'] = df_expanded['applies'].apply(categorize_applies)
-
-        fig = px.box(df_expanded, x='company_size_label', y='salary', color='applies_category',
-                     labels={'company_size_label': 'Company Size', 'salary': 'Salary', 'applies_category': 'Applies Category'},
-                     color_discrete_map={
-                         'No\nApplications': '#9ecae1',
-                         'Average\nApplications': '#4292c6',
-                         'Above Average\nApplications': '#08306b'
-                     },
-                     category_orders={'company_size_label': company_size_sorted,
-                                      'applies_category':  ['No\nApplications', 'Average\nApplications', 'Above Average\nApplications']},
-                     points=False)
-        fig.update_layout(
-            xaxis_title='Company Size',
-            yaxis_title='Salary',
-            xaxis_tickangle=-45,
-            showlegend=True,
-            height=600,
-            width=800,
-            yaxis_range=[0, df_expanded['salary'].max() + 20000]  
-        )
-        st.markdown(f"##### Salary Distribution by top 3 Company Size for {selected_skill_name}")
-        st.plotly_chart(fig)
     if selected_skill_name:
-        box_plot(df, selected_skill_name)
+        box_plot(selected_skill_name)
+
+if instrumented:
+    instrumentation.panel()
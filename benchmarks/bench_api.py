@@ -0,0 +1,142 @@
+"""Measure the JSON API's throughput and latency, and check its answers against the dashboard's views.
+
+Starts ``api.py`` in its own process and requests every endpoint for every
+skill and a sample of states from ``--clients`` threads, each on its own
+keep-alive connection, for ``--duration`` seconds per mode:
+
+- ``first``: one pass over the requests on a fresh server, building every body;
+- ``cached``: plain GETs, answered from the server's body cache;
+- ``revalidate``: GETs with the ``If-None-Match`` of the last answer, answered 304.
+
+Every body of the first pass is compared with the payload built in this
+process from the same export through :class:`views.Views`.
+
+    python benchmarks/bench_api.py [--clients 8] [--duration 10] [--states 10]
+"""
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from urllib.parse import urlencode
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import api  # noqa: E402
+from deltas import LiveDataset  # noqa: E402
+from views import Views  # noqa: E402
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_api(port, timeout=120):
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT, 'api.py'), '--port', str(port)], cwd=ROOT,
+                              stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/skills', timeout=1)
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError(f'the API did not start within {timeout} s')
+
+
+def targets(skills, states):
+    """Return a request for every endpoint, skill and state."""
+    requests = ['/skills']
+    for skill in skills:
+        requests += [f'/state-counts?{urlencode({"skill": skill})}', f'/salary-box?{urlencode({"skill": skill})}']
+        for state in states:
+            requests += [f'/summary?{urlencode({"skill": skill, "state": state})}',
+                         f'/top-companies?{urlencode({"skill": skill, "state": state})}']
+    return requests + [f'/skill-flows?{urlencode({"state": state})}' for state in states]
+
+
+def client(port, requests, deadline, tags, latencies, bodies=None):
+    # Cycles through its requests until the deadline, or once when collecting bodies.
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    i = 0
+    while (bodies is not None and i < len(requests)) or (bodies is None and time.monotonic() < deadline):
+        target = requests[i % len(requests)]
+        headers = {'If-None-Match': tags[target]} if tags is not None and target in tags else {}
+        start = time.perf_counter()
+        connection.request('GET', target, headers=headers)
+        response = connection.getresponse()
+        body = response.read()
+        latencies.append(time.perf_counter() - start)
+        if response.status not in (200, 304):
+            raise RuntimeError(f'{target}: {response.status} {body!r}')
+        if bodies is not None:
+            bodies[target] = (response.getheader('ETag'), body)
+        i += 1
+    connection.close()
+
+
+def run(port, requests, clients, duration, tags=None, bodies=None):
+    """Spread ``requests`` over ``clients`` threads and return the latencies and elapsed seconds."""
+    latencies = [[] for _ in range(clients)]
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(target=client, args=(port, requests[i::clients], deadline, tags, latencies[i], bodies))
+        for i in range(clients)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return np.concatenate(latencies), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--states', type=int, default=10, help='states requested per skill (default: %(default)s)')
+    args = parser.parse_args()
+
+    version = LiveDataset().current
+    views = Views(version.count_cube, version.salary_aggregates, None, version.key)
+    requests = targets(views.count_cube.skills, list(api.state_mapping)[:args.states])
+
+    port = free_port()
+    server = start_api(port)
+    try:
+        bodies = {}
+        results = {'first': run(port, requests, args.clients, 0, bodies=bodies)}
+        results['cached'] = run(port, requests, args.clients, args.duration)
+        tags = {target: tag for target, (tag, _) in bodies.items()}
+        results['revalidate'] = run(port, requests, args.clients, args.duration, tags=tags)
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(f'{len(requests)} distinct requests, {args.clients} clients')
+    print(f'{"mode":<12}{"requests":>10}{"per s":>10}{"p50 (ms)":>10}{"p95 (ms)":>10}{"p99 (ms)":>10}')
+    for mode, (latencies, elapsed) in results.items():
+        p50, p95, p99 = np.percentile(latencies * 1e3, [50, 95, 99])
+        print(f'{mode:<12}{len(latencies):>10}{len(latencies) / elapsed:>10.0f}{p50:>10.2f}{p95:>10.2f}{p99:>10.2f}')
+
+    mismatches = [
+        target for target, (_, body) in bodies.items() if body != api.render(views, *api.parse_request(target))
+    ]
+    if mismatches:
+        sys.exit(f'{len(mismatches)} answers differ from the views, e.g. {mismatches[0]}')
+    print(f'all {len(bodies)} answers match the dashboard views')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Time appending delta exports to the aggregates, against the size of the delta and of the history.
+
+For each history size, a synthetic export is loaded into a
+``deltas.LiveDataset`` and deltas of each size are queued and applied one by
+one. Every delta repeats a tenth of its postings from the history, which are
+skipped as duplicates. The first delta also indexes the history's keys, so it
+is timed on its own. A small append is checked against a rebuild of the
+deduplicated rows first.
+
+    python benchmarks/bench_append.py [--history 100000 1000000 4000000] [--delta 1000 10000 100000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import synthetic  # noqa: E402
+from deltas import KEY_COLUMNS, LiveDataset, add_delta  # noqa: E402
+from snapshot import build_aggregates  # noqa: E402
+
+# Share of each delta's postings repeated from the history.
+DUPLICATE_SHARE = 0.1
+# Deltas' job ids start past those of any history export.
+DELTA_FIRST_JOB_ID = 2 * synthetic.FIRST_JOB_ID
+
+
+class Deltas:
+    """Writes synthetic deltas, each with its own seed and job ids no earlier delta used."""
+
+    def __init__(self, seed=1):
+        self.seed = seed
+        self.first_job_id = DELTA_FIRST_JOB_ID
+
+    def write(self, path, history_path, n_rows):
+        delta = synthetic.generate(synthetic.Config(n_rows, seed=self.seed, first_job_id=self.first_job_id))
+        self.seed += 1
+        self.first_job_id += n_rows
+        repeated = pd.read_csv(history_path, nrows=int(n_rows * DUPLICATE_SHARE))
+        pd.concat([delta, repeated], ignore_index=True).to_csv(path, index=False)
+
+
+def timed_append(dataset, directory, history_path, n_rows, deltas):
+    delta_path = os.path.join(directory, 'delta.csv')
+    deltas.write(delta_path, history_path, n_rows)
+    add_delta(delta_path, history_path)
+    start = time.perf_counter()
+    dataset.refresh()
+    return time.perf_counter() - start
+
+
+def check_equal(directory, deltas):
+    history_path = os.path.join(directory, 'check.csv')
+    synthetic.write(synthetic.Config(20_000), history_path)
+    dataset = LiveDataset(history_path)
+    for _ in range(3):
+        timed_append(dataset, directory, history_path, 5_000, deltas)
+    # The history keeps its own repeated keys; delta rows repeating any earlier key are dropped.
+    history = pd.read_csv(history_path)
+    rows = pd.concat(
+        [history] + [pd.read_csv(os.path.join(directory, 'check.deltas', name)) for name in dataset.applied],
+        ignore_index=True,
+    )
+    keep = ~rows.duplicated(KEY_COLUMNS) | (rows.index < len(history))
+    rows[keep].to_csv(os.path.join(directory, 'whole.csv'), index=False)
+    cube, salaries = build_aggregates(os.path.join(directory, 'whole.csv'))
+    version = dataset.current
+    pd.testing.assert_frame_equal(version.count_cube.cells, cube.cells, check_dtype=False, check_categorical=False)
+    pd.testing.assert_frame_equal(
+        version.count_cube.job_cells, cube.job_cells, check_dtype=False, check_categorical=False)
+    pd.testing.assert_frame_equal(
+        version.salary_aggregates.summaries, salaries.summaries, check_dtype=False, check_categorical=False)
+    pd.testing.assert_series_equal(
+        version.salary_aggregates.applies_thresholds, salaries.applies_thresholds,
+        check_dtype=False, check_index_type=False, check_categorical=False)
+    pd.testing.assert_frame_equal(
+        version.salary_aggregates.groups, salaries.groups, check_dtype=False, check_categorical=False, rtol=1e-9)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--history', type=int, nargs='+', default=[100_000, 1_000_000, 4_000_000])
+    parser.add_argument('--delta', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    args = parser.parse_args()
+    deltas = Deltas()
+
+    with tempfile.TemporaryDirectory() as directory:
+        check_equal(directory, deltas)
+        print('appended and rebuilt aggregates of a 20,000-row export and three deltas match')
+
+        print(f'{"history":>10}{"first delta (s)":>17}' + ''.join(f'{f"{n:,} rows (s)":>18}' for n in args.delta))
+        for history in args.history:
+            history_path = os.path.join(directory, f'history{history}.csv')
+            synthetic.write(synthetic.Config(history), history_path)
+            dataset = LiveDataset(history_path)
+            first = timed_append(dataset, directory, history_path, args.delta[0], deltas)
+            times = [timed_append(dataset, directory, history_path, n_rows, deltas) for n_rows in args.delta]
+            print(f'{history:>10,}{first:>17.3f}' + ''.join(f'{elapsed:>18.3f}' for elapsed in times))
+
+
+if __name__ == '__main__':
+    main()
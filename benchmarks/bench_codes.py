@@ -0,0 +1,75 @@
+"""Time building the count cube and answering the dashboard's count queries on a large synthetic export.
+
+Generates the postings in memory, builds ``aggregates.CountCube`` from them
+and times the queries each view runs, for every skill and a sample of states.
+
+    python benchmarks/bench_codes.py [--rows 5000000] [--states 10] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import synthetic  # noqa: E402
+from aggregates import CountCube  # noqa: E402
+from postings import JobSkills, add_derived_columns, apply_schema, state_mapping  # noqa: E402
+
+
+def synthetic_postings(n_rows, seed=0):
+    postings = JobSkills.from_rows(apply_schema(synthetic.generate(synthetic.Config(n_rows, seed=seed))))
+    add_derived_columns(postings.jobs)
+    return postings
+
+
+def timed(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5_000_000)
+    parser.add_argument('--states', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    postings = synthetic_postings(args.rows)
+    start = time.perf_counter()
+    cube = CountCube(postings)
+    timed_build = time.perf_counter() - start
+    skills = cube.skills
+    states = list(state_mapping)[:args.states]
+    work_types = list(postings.jobs['formatted_work_type'].dropna().unique())
+
+    queries = {
+        'total': lambda: [cube.total(skill, state) for skill in skills for state in states],
+        'choropleth counts': lambda: [cube.counts('state', skill=skill) for skill in skills],
+        'sankey flows': lambda: [cube.skill_flows(state) for state in states],
+        'top companies': lambda: [
+            cube.top('company_name', 5, skill, state, work_type)
+            for skill in skills for state in states for work_type in work_types[:2]
+        ],
+        'company x level': lambda: [
+            cube.counts(['company_name', 'formatted_experience_level'], skill, state)
+            for skill in skills for state in states
+        ],
+        'all-skills fallback': lambda: [cube.top('company_name', 5, state=state) for state in states],
+    }
+    print(f'{args.rows:,} rows, {len(cube.cells):,} cells, {len(cube.job_cells):,} job cells')
+    print(f'{"step":<22}{"calls":>8}{"total (s)":>11}{"per call (ms)":>15}')
+    print(f'{"build cube":<22}{1:>8}{timed_build:>11.3f}{timed_build * 1000:>15.1f}')
+    for name, query in queries.items():
+        calls = len(query())
+        elapsed = timed(query, args.repeat)
+        print(f'{name:<22}{calls:>8}{elapsed:>11.3f}{elapsed / calls * 1000:>15.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Measure cold start: time from a fresh process to the dashboard's first complete render.
+
+Each measurement runs in its own interpreter, so nothing is cached in memory.
+"rebuild" deletes the aggregate snapshot first, so the aggregates are built from
+the postings; "snapshot" loads the snapshot the previous run wrote.
+
+    python benchmarks/bench_cold_start.py [--csv main_df_subset.csv] [--repeat 3]
+
+``--csv`` points the aggregate load at another export; the render always uses
+the dashboard's own data.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from postings import DATA_PATH  # noqa: E402
+from snapshot import snapshot_path  # noqa: E402
+
+# Imports are timed too: they are part of every cold start.
+LOAD = '''
+import time
+start = time.perf_counter()
+from snapshot import load_aggregates
+load_aggregates({csv_path!r})
+print(time.perf_counter() - start)
+'''
+
+RENDER = '''
+import time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file('app.py', default_timeout=600)
+at.run()
+assert not at.exception, at.exception
+print(time.perf_counter() - start)
+'''
+
+
+def timed(code, rebuild, csv_path):
+    if rebuild and os.path.exists(snapshot_path(csv_path)):
+        os.remove(snapshot_path(csv_path))
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return float(result.stdout.split()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--csv', default=os.path.join(ROOT, DATA_PATH))
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    csv_path = os.path.abspath(args.csv)
+
+    print(f'{"step":<22}{"rebuild (s)":>12}{"snapshot (s)":>14}')
+    steps = [('load aggregates', LOAD.format(csv_path=csv_path), csv_path), ('first render', RENDER, os.path.join(ROOT, DATA_PATH))]
+    for name, code, data_path in steps:
+        rebuild = statistics.median(timed(code, True, data_path) for _ in range(args.repeat))
+        snapshot = statistics.median(timed(code, False, data_path) for _ in range(args.repeat))
+        print(f'{name:<22}{rebuild:>12.2f}{snapshot:>14.2f}')
+
+
+if __name__ == '__main__':
+    main()
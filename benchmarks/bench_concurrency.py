@@ -0,0 +1,237 @@
+"""Load-test the dashboard with N concurrent sessions against a real server.
+
+Starts ``streamlit run app.py`` and connects N websocket clients to it, each
+speaking the browser's protocol: a client loads the page, then, after an
+exponentially distributed think time, picks a random skill or state in the
+sidebar (a full rerun) or a random work type of the top-companies chart (a
+rerun of that chart's fragment), and waits for the rerun to finish before
+thinking again. Latency is from the request leaving the client to the
+server's ``script_finished``, so it includes the time a rerun waits for the
+GIL behind other sessions' reruns.
+
+For each N, sessions arrive over the first think time and run for
+``--duration`` seconds. The report gives the p50, p95 and p99 latency of
+their selections' reruns (page loads are reported apart, in the JSON output),
+the reruns completed per second, the server's CPU use (100% is one core) and
+its peak RSS. Levels run in order on the same server, so its caches are warm
+after the first one.
+
+    python benchmarks/bench_concurrency.py [--sessions 1,2,4,8,16,32,64] [--duration 30] [--think 2.0]
+                                           [--seed 0] [--output concurrency.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import numpy as np
+import psutil
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SKILL_LABEL = 'Select Skill:'
+STATE_LABEL = 'Select a State'
+WORK_TYPE_LABEL = 'Select Work Type'
+# Odds of each interaction: a sidebar pick reruns the script, a work type its fragment.
+ACTIONS = {'skill': 0.25, 'state': 0.25, 'work_type': 0.5}
+SAMPLE_INTERVAL = 0.25
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, timeout=120):
+    """Start the dashboard on ``port`` and return its process once it answers health checks."""
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', os.path.join(ROOT, 'app.py'), '--server.headless', 'true',
+         '--server.address', '127.0.0.1', '--server.port', str(port), '--browser.gatherUsageStats', 'false'],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/_stcore/health', timeout=1)
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError(f'the dashboard did not start within {timeout} s')
+
+
+class Session:
+    """One browser session: its websocket, its widget values and the widgets of the last rerun."""
+
+    def __init__(self, url, rng):
+        self.url = url
+        self.rng = rng
+        self.values = {}
+        self.widgets = {}
+
+    async def connect(self):
+        """Open the session and load the page, returning the load's latency in seconds."""
+        self.ws = await websockets.connect(self.url, subprotocols=['streamlit'], max_size=None)
+        return await self.rerun()
+
+    async def close(self):
+        await self.ws.close()
+
+    async def rerun(self, fragment_id=''):
+        """Request a rerun with the current widget values and return its latency in seconds."""
+        message = BackMsg()
+        message.rerun_script.fragment_id = fragment_id
+        for label, value in self.values.items():
+            widget_id, options, _ = self.widgets[label]
+            if value in options:
+                state = message.rerun_script.widget_states.widgets.add()
+                state.id = widget_id
+                state.string_value = value
+        start = time.perf_counter()
+        await self.ws.send(message.SerializeToString())
+        while True:
+            forward = ForwardMsg()
+            forward.ParseFromString(await self.ws.recv())
+            kind = forward.WhichOneof('type')
+            if kind == 'script_finished':
+                return time.perf_counter() - start
+            if kind == 'delta' and forward.delta.WhichOneof('type') == 'new_element':
+                element = forward.delta.new_element
+                element_type = element.WhichOneof('type')
+                if element_type == 'exception':
+                    raise RuntimeError(f'the dashboard raised {element.exception.type}: {element.exception.message}')
+                if element_type in ('selectbox', 'radio'):
+                    widget = getattr(element, element_type)
+                    self.widgets[widget.label] = (widget.id, list(widget.options), forward.delta.fragment_id)
+
+    async def interact(self):
+        """Make one random selection and return ``(action, latency)``."""
+        action = self.rng.choices(list(ACTIONS), weights=list(ACTIONS.values()))[0]
+        label = {'skill': SKILL_LABEL, 'state': STATE_LABEL, 'work_type': WORK_TYPE_LABEL}[action]
+        if label not in self.widgets:
+            # The chart shows no work type for this selection: pick a state instead.
+            action, label = 'state', STATE_LABEL
+        _, options, fragment_id = self.widgets[label]
+        self.values[label] = self.rng.choice(options)
+        return action, await self.rerun(fragment_id if action == 'work_type' else '')
+
+
+async def run_session(url, rng, think, deadline, latencies):
+    # Sessions arrive over the first think time rather than all at once.
+    await asyncio.sleep(rng.uniform(0, think))
+    session = Session(url, rng)
+    latencies.append(('load', await session.connect()))
+    try:
+        while True:
+            await asyncio.sleep(rng.expovariate(1 / think) if think else 0)
+            if time.monotonic() >= deadline:
+                return
+            action, latency = await session.interact()
+            latencies.append((action, latency))
+    finally:
+        await session.close()
+
+
+async def sample(process, samples, stop):
+    while not stop.is_set():
+        samples.append(process.memory_info().rss)
+        try:
+            await asyncio.wait_for(stop.wait(), SAMPLE_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+def percentiles(seconds):
+    milliseconds = np.asarray(seconds) * 1e3
+    if not len(milliseconds):
+        return {'count': 0}
+    return {'count': len(milliseconds), **{
+        f'p{q}': float(np.percentile(milliseconds, q)) for q in (50, 95, 99)
+    }}
+
+
+async def run_level(url, process, n, duration, think, seed):
+    """Run ``n`` sessions for ``duration`` seconds and return the level's measures."""
+    latencies = []
+    samples = []
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample(process, samples, stop))
+    cpu_before = process.cpu_times()
+    start = time.monotonic()
+    deadline = start + duration
+    await asyncio.gather(*(
+        run_session(url, random.Random(seed * 1000 + i), think, deadline, latencies) for i in range(n)))
+    elapsed = time.monotonic() - start
+    cpu_after = process.cpu_times()
+    stop.set()
+    await sampler
+    cpu = (cpu_after.user - cpu_before.user) + (cpu_after.system - cpu_before.system)
+    reruns = [latency for action, latency in latencies if action != 'load']
+    return {
+        'sessions': n,
+        'seconds': elapsed,
+        'reruns': percentiles(reruns),
+        'actions': {
+            action: percentiles([latency for name, latency in latencies if name == action])
+            for action in ['load', *ACTIONS]
+        },
+        'throughput': len(reruns) / elapsed,
+        'cpu_percent': cpu / elapsed * 100,
+        'peak_rss_mb': max(samples) / 2**20,
+    }
+
+
+def report(level):
+    reruns = level['reruns']
+    print(f'{level["sessions"]:>8}{reruns["count"]:>8}{reruns.get("p50", np.nan):>10.1f}{reruns.get("p95", np.nan):>10.1f}'
+          f'{reruns.get("p99", np.nan):>10.1f}{level["throughput"]:>10.2f}{level["cpu_percent"]:>8.0f}'
+          f'{level["peak_rss_mb"]:>10.0f}', flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', default='1,2,4,8,16,32,64', help='concurrent sessions of each level')
+    parser.add_argument('--duration', type=float, default=30, help='seconds each level runs (default: %(default)s)')
+    parser.add_argument('--think', type=float, default=2.0, help='mean think time in seconds (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='concurrency.json', help='results file (default: %(default)s)')
+    args = parser.parse_args()
+    levels = [int(n) for n in args.sessions.split(',')]
+
+    port = free_port()
+    server = start_server(port)
+    url = f'ws://127.0.0.1:{port}/_stcore/stream'
+    results = {
+        'environment': {'python': platform.python_version(), 'machine': platform.machine(), 'cpus': os.cpu_count()},
+        'duration': args.duration,
+        'think': args.think,
+        'levels': [],
+    }
+    try:
+        process = psutil.Process(server.pid)
+        print(f'{"sessions":>8}{"reruns":>8}{"p50 (ms)":>10}{"p95 (ms)":>10}{"p99 (ms)":>10}{"per s":>10}'
+              f'{"cpu %":>8}{"rss (MB)":>10}')
+        for n in levels:
+            level = asyncio.run(run_level(url, process, n, args.duration, args.think, args.seed))
+            results['levels'].append(level)
+            report(level)
+    finally:
+        server.terminate()
+        server.wait()
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
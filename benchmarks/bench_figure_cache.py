@@ -0,0 +1,102 @@
+"""Measure how the shared figure cache speeds up repeat selections.
+
+First times building each chart's figure against fetching it from a
+``FigureCache``, then times headless dashboard reruns that toggle between two
+skills: the first visit to each skill builds its figures, later visits, from the
+same session or a new one, only look them up.
+
+    python benchmarks/bench_figure_cache.py [--skills Sales,Legal] [--state CA] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+from streamlit.testing.v1 import AppTest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from aggregates import CountCube, SalaryAggregates  # noqa: E402
+from charts import choropleth_figure, salary_box_figure, sankey_figure, top_companies_figure  # noqa: E402
+from figure_cache import FigureCache, figure_nbytes  # noqa: E402
+from postings import DATA_PATH, dataset_path, read_job_skills  # noqa: E402
+
+
+def best_of(repeat, func):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def bench_builders(skill, state, repeat):
+    postings = read_job_skills(dataset_path(os.path.join(ROOT, DATA_PATH)))
+    cube, salaries = CountCube(postings), SalaryAggregates(postings.rows())
+
+    def state_counts():
+        counts = cube.counts('state', skill=skill).reset_index()
+        counts.columns = ['state', 'job_count']
+        return counts
+
+    builders = {
+        'choropleth': lambda: choropleth_figure(state_counts()),
+        'sankey': lambda: sankey_figure(*cube.skill_flows(state)),
+        'top_companies': lambda: top_companies_figure(cube.top_companies().breakdown(
+            5, skill, state, work_type=cube.in_order_of_appearance('formatted_work_type', skill, state)[0],
+        )),
+        'salary_box': lambda: salary_box_figure(*salaries.box_statistics(skill)),
+    }
+    cache = FigureCache()
+    print(f'{"figure":<14}{"build (ms)":>12}{"hit (ms)":>12}{"bytes":>10}')
+    for name, build in builders.items():
+        built = best_of(repeat, build)
+        size = figure_nbytes(cache.get_or_build(name, build))
+        hit = best_of(repeat, lambda: cache.get_or_build(name, build))
+        print(f'{name:<14}{built * 1e3:>12.2f}{hit * 1e3:>12.4f}{size:>10,}')
+    print(cache.stats())
+
+
+def bench_reruns(skills, state, repeat):
+    def visit(session, skill):
+        session.selectbox(key='skill_select').set_value(skill)
+        start = time.perf_counter()
+        session.run()
+        assert not session.exception, session.exception
+        return time.perf_counter() - start
+
+    first = AppTest.from_file(os.path.join(ROOT, 'app.py'), default_timeout=600)
+    first.run()
+    first.selectbox(key='state_select').set_value(state)
+    first.run()
+    print(f'\n{"rerun":<34}{"time (ms)":>10}')
+    for skill in skills:
+        print(f'{"first visit to " + skill:<34}{visit(first, skill) * 1e3:>10.1f}')
+    repeats = [visit(first, skill) for _ in range(repeat) for skill in skills]
+    print(f'{"repeat visit, same session":<34}{min(repeats) * 1e3:>10.1f}')
+
+    second = AppTest.from_file(os.path.join(ROOT, 'app.py'), default_timeout=600)
+    second.run()
+    second.selectbox(key='state_select').set_value(state)
+    second.run()
+    repeats = [visit(second, skill) for _ in range(repeat) for skill in skills]
+    print(f'{"repeat visit, new session":<34}{min(repeats) * 1e3:>10.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--skills', default='Sales,Legal')
+    parser.add_argument('--state', default='CA')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    skills = args.skills.split(',')
+
+    os.chdir(ROOT)
+    bench_builders(skills[0], args.state, args.repeat)
+    bench_reruns(skills, args.state, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Measure per-widget interaction latency with full-script and fragment-scoped reruns.
+
+For each widget, the value is toggled back and forth in a headless session and
+every rerun is timed. "full" reruns the whole script, which is what every
+interaction cost before the dashboard sections became fragments. "fragment"
+reruns only the fragment holding the widget, the way the browser requests it
+for widgets inside a section. Sidebar widgets sit outside every fragment, so
+they always rerun the whole script.
+
+    python benchmarks/bench_fragments.py [--skill Sales] [--state CA] [--repeat 10]
+"""
+import argparse
+import contextlib
+import functools
+import os
+import statistics
+import time
+
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1 import local_script_runner
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def fragment_ids(session):
+    """Return ``{function name: fragment id}`` for the fragments registered by ``session``'s last run."""
+    ids = {}
+    for fragment_id, fragment in session._fragment_storage._fragments.items():
+        for cell in fragment.__closure__ or ():
+            name = getattr(cell.cell_contents, '__name__', None)
+            if callable(cell.cell_contents) and name != 'wrapped_fragment':
+                ids[name] = fragment_id
+    return ids
+
+
+@contextlib.contextmanager
+def fragment_rerun(fragment_id):
+    # AppTest always requests a full rerun; queue the fragment instead, as the
+    # browser does when a widget inside a fragment changes.
+    rerun_data = local_script_runner.RerunData
+    local_script_runner.RerunData = functools.partial(rerun_data, fragment_id_queue=[fragment_id])
+    try:
+        yield
+    finally:
+        local_script_runner.RerunData = rerun_data
+
+
+def timed_rerun(session, fragment_id=None):
+    tree = session._tree
+    start = time.perf_counter()
+    with fragment_rerun(fragment_id) if fragment_id else contextlib.nullcontext():
+        session.run()
+    elapsed = time.perf_counter() - start
+    assert not session.exception, session.exception
+    if fragment_id:
+        # A fragment rerun only returns the fragment's elements; keep the full
+        # page (which already holds the new widget value) for the next interaction.
+        session._tree = tree
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--skill', default='Sales')
+    parser.add_argument('--state', default='CA')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    session = AppTest.from_file(os.path.join(ROOT, 'app.py'), default_timeout=600)
+    session.run()
+    session.selectbox(key='skill_select').set_value(args.skill)
+    session.selectbox(key='state_select').set_value(args.state)
+    session.run()
+    fragments = fragment_ids(session)
+
+    other_skill = next(skill for skill in session.selectbox(key='skill_select').options if skill != args.skill)
+    other_state = 'TX' if args.state != 'TX' else 'NY'
+    work_types = session.radio[0].options
+    widgets = {
+        'skill_select': (lambda s: s.selectbox(key='skill_select'), [other_skill, args.skill], None),
+        'state_select': (lambda s: s.selectbox(key='state_select'), [other_state, args.state], None),
+        'sankey_top_n': (lambda s: s.number_input(key='sankey_top_n'), [10, 5], 'skill_flow_section'),
+        'work_type': (lambda s: s.radio[0], work_types[1:2] + work_types[:1], 'top_companies_section'),
+    }
+
+    print(f'{"widget":<14}{"section":<24}{"full p50 (ms)":>15}{"fragment p50 (ms)":>19}{"speed-up":>10}')
+    for name, (widget, values, section) in widgets.items():
+        timings = {'full': [], 'fragment': []}
+        for mode in ['full', 'fragment'] if section else ['full']:
+            for i in range(args.repeat):
+                widget(session).set_value(values[i % len(values)])
+                timings[mode].append(timed_rerun(session, fragments[section] if mode == 'fragment' else None))
+            widget(session).set_value(values[-1])
+            session.run()
+        full = statistics.median(timings['full'])
+        if section:
+            fragment = statistics.median(timings['fragment'])
+            print(f'{name:<14}{section:<24}{full * 1e3:>15.1f}{fragment * 1e3:>19.1f}{full / fragment:>9.1f}x')
+        else:
+            print(f'{name:<14}{"(whole script)":<24}{full * 1e3:>15.1f}{"-":>19}{"-":>10}')
+
+
+if __name__ == '__main__':
+    main()
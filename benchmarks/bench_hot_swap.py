@@ -0,0 +1,144 @@
+"""Check the hot swap of a replaced export under concurrent readers.
+
+Loads a synthetic export into a watched ``deltas.LiveDataset``, starts reader
+threads that each take the current version and query it in a loop, as
+dashboard reruns do, and replaces the export on disk. Other threads call
+``refresh`` in a loop meanwhile, competing with the watcher. Reports the
+readers' latency before and during the rebuild and how long the new version
+took to appear, and fails unless exactly one rebuild ran, every reader saw the
+new version and the old version was freed.
+
+    python benchmarks/bench_hot_swap.py [--rows 1000000] [--readers 8]
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import threading
+import time
+import weakref
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import deltas  # noqa: E402
+import synthetic  # noqa: E402
+
+INTERVAL = 0.2
+
+
+class CountingLoad:
+    """Wraps ``deltas.load_aggregates``, counting the calls and the most that ran at once."""
+
+    def __init__(self, load):
+        self.load = load
+        self.calls = 0
+        self.running = 0
+        self.most_running = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        with self._lock:
+            self.calls += 1
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+        try:
+            return self.load(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.running -= 1
+
+
+def reader(dataset, stop, latencies, versions):
+    rng = np.random.default_rng()
+    while not stop.is_set():
+        start = time.perf_counter()
+        # A rerun: one version throughout.
+        version = dataset.current
+        skill = synthetic.SKILLS[rng.integers(len(synthetic.SKILLS))]
+        version.count_cube.top('company_name', 5, skill=skill)
+        version.salary_aggregates.summary(skill=skill)
+        latencies.append((start, time.perf_counter() - start))
+        versions.add(version.signature)
+        del version
+
+
+def refresher(dataset, stop):
+    while not stop.is_set():
+        dataset.refresh()
+        time.sleep(0.01)
+
+
+def percentiles(latencies):
+    values = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return np.percentile(values, 50), np.percentile(values, 99), values.max()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--refreshers', type=int, default=4)
+    args = parser.parse_args()
+    load = deltas.load_aggregates = CountingLoad(deltas.load_aggregates)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'postings.csv')
+        synthetic.write(synthetic.Config(args.rows, seed=0), path)
+        dataset = deltas.LiveDataset(path).watch(INTERVAL)
+        old = weakref.ref(dataset.current.count_cube)
+        old_signature = dataset.current.signature
+        load.calls = load.most_running = 0
+
+        stop = threading.Event()
+        latencies = [[] for _ in range(args.readers)]
+        versions = [set() for _ in range(args.readers)]
+        readers = [
+            threading.Thread(target=reader, args=(dataset, stop, latencies[i], versions[i]))
+            for i in range(args.readers)
+        ]
+        readers += [threading.Thread(target=refresher, args=(dataset, stop)) for _ in range(args.refreshers)]
+        for thread in readers:
+            thread.start()
+        time.sleep(1)
+
+        replacement = os.path.join(directory, 'replacement.csv')
+        synthetic.write(synthetic.Config(args.rows, seed=1), replacement)
+        replaced_at = time.perf_counter()
+        os.replace(replacement, path)
+        while dataset.current.signature == old_signature:
+            time.sleep(0.01)
+        swapped_at = time.perf_counter()
+        time.sleep(1)
+        stop.set()
+        for thread in readers:
+            thread.join()
+        gc.collect()
+
+        every = [latency for reader_latencies in latencies for latency in reader_latencies]
+        before = [elapsed for start, elapsed in every if start < replaced_at]
+        during = [elapsed for start, elapsed in every if replaced_at <= start < swapped_at]
+        print(f'{args.readers} readers, {args.refreshers} refreshers, {args.rows:,}-row export')
+        print(f'{"queries":<16}{"count":>8}{"p50 (ms)":>10}{"p99 (ms)":>10}{"max (ms)":>10}')
+        for name, values in [('before', before), ('during rebuild', during)]:
+            print(f'{name:<16}{len(values):>8}' + ''.join(f'{value:>10.1f}' for value in percentiles(values)))
+        print(f'new version swapped in {swapped_at - replaced_at:.2f} s after the replace '
+              f'(checked every {INTERVAL} s, settled for one check)')
+        print(f'rebuilds: {load.calls}, at most {load.most_running} at once; old version freed: {old() is None}')
+
+        failures = []
+        if load.calls != 1 or load.most_running != 1:
+            failures.append(f'{load.calls} rebuilds ran, at most {load.most_running} at once')
+        if not all(dataset.current.signature in seen for seen in versions):
+            failures.append('a reader never saw the new version')
+        if old() is not None:
+            failures.append('the old version is still referenced')
+        if failures:
+            sys.exit('; '.join(failures))
+
+
+if __name__ == '__main__':
+    main()
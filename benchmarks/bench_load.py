@@ -0,0 +1,46 @@
+"""Compare the CSV and Arrow IPC load paths of ``postings.read_postings``.
+
+    python benchmarks/bench_load.py [csv_path] [--repeat N]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from postings import DATA_PATH, convert, read_postings  # noqa: E402
+
+
+def time_load(path, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        df = read_postings(path)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('csv_path', nargs='?', default=DATA_PATH)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        arrow_path = convert(args.csv_path, os.path.join(tmp, 'postings.arrow'))
+        csv_seconds, df = time_load(args.csv_path, args.repeat)
+        arrow_seconds, _ = time_load(arrow_path, args.repeat)
+        sizes = os.path.getsize(args.csv_path), os.path.getsize(arrow_path)
+
+    print(f'{len(df):,} rows, median of {args.repeat} loads')
+    print(f'{"format":<8}{"size (MB)":>12}{"load (s)":>12}')
+    print(f'{"csv":<8}{sizes[0] / 1e6:>12.1f}{csv_seconds:>12.3f}')
+    print(f'{"arrow":<8}{sizes[1] / 1e6:>12.1f}{arrow_seconds:>12.3f}')
+    print(f'speed-up: {csv_seconds / arrow_seconds:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""Compare the memory of the postings one row per (job, skill) with ``postings.JobSkills``.
+
+Reports, for the dashboard's export and a synthetic one, the memory of the
+typed postings as the export lays them out, and of the jobs table and
+job <-> skill bridge ``JobSkills`` splits them into, and how many postings a
+cross-skill count sees either way.
+
+    python benchmarks/bench_normalized.py [--rows 2000000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import synthetic  # noqa: E402
+from postings import DATA_PATH, JobSkills, add_derived_columns, read_csv  # noqa: E402
+
+
+def report(name, path):
+    df = add_derived_columns(read_csv(path))
+    postings = JobSkills.from_rows(df)
+    wide = df.memory_usage(deep=True).sum()
+    jobs = postings.jobs.memory_usage(deep=True).sum()
+    bridge = postings.bridge.memory_usage(deep=True).sum()
+    print(f'{name:<12}{len(df):>12,}{len(postings.jobs):>12,}{len(postings.bridge):>12,}'
+          f'{wide / 2**20:>12.1f}{jobs / 2**20:>12.1f}{bridge / 2**20:>14.1f}{wide / (jobs + bridge):>8.1f}x')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    args = parser.parse_args()
+
+    print(f'{"export":<12}{"rows":>12}{"jobs":>12}{"pairs":>12}{"rows (MiB)":>12}{"jobs (MiB)":>12}'
+          f'{"bridge (MiB)":>14}{"saving":>9}')
+    report('dashboard', os.path.join(ROOT, DATA_PATH))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'postings.csv')
+        synthetic.write(synthetic.Config(args.rows), path)
+        report('synthetic', path)
+
+
+if __name__ == '__main__':
+    main()
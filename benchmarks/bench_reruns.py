@@ -0,0 +1,168 @@
+"""Measure the dashboard's per-rerun latency headlessly and compare it against a stored baseline.
+
+Drives ``app.py`` through Streamlit's ``AppTest``, with no browser or network,
+over a grid of selections: each (skill, state) is picked in the sidebar,
+which reruns the whole script, then each work type of the top-companies chart
+is picked, which reruns only that chart's fragment, as the browser does. The
+grid is swept twice: the first pass builds every figure, the second finds
+them in the figure cache. Every rerun is timed, and so is every dashboard
+section it runs (see ``timing.SECTIONS``).
+
+The p50, p95 and max of each measure are written as JSON. With a baseline
+file, each p95 is compared with the baseline's and the run fails when one has
+grown by more than ``--threshold`` (and by more than ``--min-delta`` ms, so
+sub-millisecond noise does not count).
+
+    python benchmarks/bench_reruns.py [--skills 4] [--states CA,TX,NY,WA] [--output reruns.json]
+                                      [--baseline benchmarks/reruns_baseline.json] [--threshold 0.2]
+                                      [--save-baseline]
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+import streamlit
+from streamlit.testing.v1 import AppTest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import timing  # noqa: E402
+from bench_fragments import fragment_ids, timed_rerun  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'reruns_baseline.json')
+
+
+def summary(seconds):
+    milliseconds = np.asarray(seconds) * 1e3
+    return {
+        'count': len(milliseconds),
+        'p50': float(np.percentile(milliseconds, 50)),
+        'p95': float(np.percentile(milliseconds, 95)),
+        'max': float(milliseconds.max()),
+    }
+
+
+def sweep(session, skills, states, reruns, sections):
+    """Rerun ``session`` over every (skill, state) and work type, adding the timings to ``reruns`` and ``sections``."""
+    bar_fragment = fragment_ids(session)['top_companies_section']
+    for skill in skills:
+        for state in states:
+            session.selectbox(key='skill_select').set_value(skill)
+            session.selectbox(key='state_select').set_value(state)
+            with timing.recording() as timings:
+                reruns['selection'].append(timed_rerun(session))
+            for radio in session.radio[:1]:
+                for work_type in radio.options[1:]:
+                    session.radio[0].set_value(work_type)
+                    with timing.recording() as fragment_timings:
+                        reruns['work_type'].append(timed_rerun(session, bar_fragment))
+                    timings += fragment_timings
+                # Back to the first work type, as a new selection would find it.
+                session.radio[0].set_value(radio.options[0])
+                session.run()
+            for section, seconds, _ in timings:
+                sections[section].append(seconds)
+
+
+def run(skills, states):
+    os.chdir(ROOT)
+    os.environ.pop('VISU_WARMUP', None)
+    session = AppTest.from_file(os.path.join(ROOT, 'app.py'), default_timeout=600)
+    start = time.perf_counter()
+    session.run()
+    startup = time.perf_counter() - start
+    assert not session.exception, session.exception
+    skills = session.selectbox(key='skill_select').options[:skills]
+
+    results = {
+        'environment': {
+            'python': platform.python_version(),
+            'streamlit': streamlit.__version__,
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+        },
+        'grid': {'skills': skills, 'states': states},
+        'startup_ms': startup * 1e3,
+        'reruns': {},
+        'sections': {},
+    }
+    for visit in ['first', 'repeat']:
+        reruns = {'selection': [], 'work_type': []}
+        sections = {section: [] for section in timing.SECTIONS}
+        sweep(session, skills, states, reruns, sections)
+        for name, seconds in reruns.items():
+            results['reruns'][f'{name} ({visit})'] = summary(seconds)
+        for section, seconds in sections.items():
+            if seconds:
+                results['sections'][f'{section} ({visit})'] = summary(seconds)
+    return results
+
+
+def regressions(results, baseline, threshold, min_delta):
+    """Return ``(measure, baseline p95, p95)`` of every measure whose p95 regressed beyond the tolerances."""
+    found = []
+    for group in ['reruns', 'sections']:
+        for name, stats in results[group].items():
+            before = baseline.get(group, {}).get(name)
+            if before is None:
+                continue
+            p95, base = stats['p95'], before['p95']
+            if p95 > base * (1 + threshold) and p95 - base > min_delta:
+                found.append((f'{group}/{name}', base, p95))
+    return found
+
+
+def report(results, baseline):
+    print(f'startup: {results["startup_ms"]:.0f} ms')
+    print(f'{"measure":<34}{"count":>7}{"p50 (ms)":>10}{"p95 (ms)":>10}{"max (ms)":>10}{"base p95":>10}')
+    for group in ['reruns', 'sections']:
+        for name, stats in results[group].items():
+            before = (baseline or {}).get(group, {}).get(name)
+            base = f'{before["p95"]:>10.1f}' if before else f'{"-":>10}'
+            print(f'{group + "/" + name:<34}{stats["count"]:>7}{stats["p50"]:>10.1f}{stats["p95"]:>10.1f}'
+                  f'{stats["max"]:>10.1f}{base}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--skills', type=int, default=4, help='first N skills of the sidebar (default: %(default)s)')
+    parser.add_argument('--states', default='CA,TX,NY,WA')
+    parser.add_argument('--output', default='reruns.json', help='results file (default: %(default)s)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline to compare with (default: %(default)s)')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed p95 growth (default: %(default)s)')
+    parser.add_argument('--min-delta', type=float, default=1.0, help='ms a p95 may grow regardless (default: %(default)s)')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the baseline instead')
+    args = parser.parse_args()
+
+    results = run(args.skills, args.states.split(','))
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        report(results, None)
+        print(f'baseline saved to {args.baseline}')
+        return
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    if baseline is None:
+        print(f'no baseline at {args.baseline}; run with --save-baseline to store one')
+        return
+    found = regressions(results, baseline, args.threshold, args.min_delta)
+    if found:
+        sys.exit('p95 regressions beyond {:.0%}:\n'.format(args.threshold) + '\n'.join(
+            f'  {name}: {base:.1f} ms -> {p95:.1f} ms' for name, base, p95 in found))
+    print(f'no p95 regression beyond {args.threshold:.0%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Compare the box plot's old row-wise salary expansion with ``aggregates.expand_salaries``.
+
+    python benchmarks/bench_salary_expansion.py [--rows 100000,1000000,10000000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synthetic  # noqa: E402
+from aggregates import expand_salaries  # noqa: E402
+from postings import RowIndex, add_derived_columns, apply_schema  # noqa: E402
+
+
+def legacy_expand(df, skill):
+    # The box plot's expansion before aggregates.expand_salaries, kept for comparison.
+    filter_box = df[df['skill_name'] == skill]
+    filter_box['salary'] = df.apply(lambda row: [row['min_salary'], row['max_salary']], axis=1)
+    df_expanded = filter_box.explode('salary')
+    df_expanded['salary'] = pd.to_numeric(df_expanded['salary'], errors='coerce')
+    df_expanded['applies'] = pd.to_numeric(df_expanded['applies'], errors='coerce')
+    return df_expanded.dropna(subset=['salary', 'applies'])
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', default='100000,1000000,10000000')
+    args = parser.parse_args()
+
+    pd.options.mode.chained_assignment = None
+    skill = synthetic.SKILLS[0]
+    print(f'{"rows":>12}{"legacy (s)":>12}{"vectorized (s)":>16}{"speed-up":>10}')
+    for n_rows in (int(n) for n in args.rows.split(',')):
+        df = add_derived_columns(apply_schema(synthetic.generate(synthetic.Config(n_rows))))
+        row_index = RowIndex(df)
+        legacy_seconds, legacy = timed(legacy_expand, df, skill)
+        vectorized_seconds, vectorized = timed(lambda: expand_salaries(df.iloc[row_index.rows(skill=skill)]))
+        assert np.array_equal(legacy['salary'].to_numpy(), vectorized['salary'].to_numpy(dtype='float64'))
+        print(f'{n_rows:>12,}{legacy_seconds:>12.3f}{vectorized_seconds:>16.4f}{legacy_seconds / vectorized_seconds:>9.0f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""Measure process memory as headless dashboard sessions are added.
+
+Each session is a live ``AppTest`` instance that has rendered the dashboard once,
+all in one process, the way concurrent browser sessions share one server.
+
+    python benchmarks/bench_sessions.py [--sessions 1,2,4,8,16,32]
+"""
+import argparse
+import gc
+import os
+
+import psutil
+from streamlit.testing.v1 import AppTest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', default='1,2,4,8,16,32')
+    args = parser.parse_args()
+    checkpoints = sorted(int(n) for n in args.sessions.split(','))
+
+    os.chdir(ROOT)
+    process = psutil.Process()
+    sessions = []
+    print(f'{"sessions":>8}{"rss (MB)":>12}{"uss (MB)":>12}')
+    for target in checkpoints:
+        while len(sessions) < target:
+            session = AppTest.from_file(os.path.join(ROOT, 'app.py'), default_timeout=600)
+            session.run()
+            sessions.append(session)
+        gc.collect()
+        memory = process.memory_full_info()
+        print(f'{target:>8}{memory.rss / 1e6:>12.1f}{memory.uss / 1e6:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Report the accuracy, memory and query time of the salary sketches in ``aggregates.SalaryAggregates``.
+
+For every skill, the box plot quartiles answered from merged sketches are
+compared with the exact quartiles of the underlying salaries, as Plotly
+computes them from the raw values. Boxes of at most ``--compression``
+salaries must match them; for larger boxes, the relative error of the
+quartiles and their error in rank are reported.
+
+    python benchmarks/bench_sketch.py [data_path] [--compression 200]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+
+from aggregates import SalaryAggregates, categorize_applies, expand_salaries, top_company_sizes  # noqa: E402
+from postings import DATA_PATH, RowIndex, dataset_path, read_postings  # noqa: E402
+
+BOX_KEYS = ['applies_category', 'company_size_label']
+QUARTILES = {'q1': 0.25, 'median': 0.5, 'q3': 0.75}
+
+
+def box_statistics(df, by, column):
+    """Return the box plot summary of ``column`` for each group of ``by`` in ``df``.
+
+    One row per observed group, sorted by key, with the group's ``count``,
+    ``min``, ``q1``, ``median``, ``q3`` and ``max``. Quartiles are interpolated
+    the way Plotly does by default (``quartilemethod='linear'``), so a box drawn
+    from these numbers matches one Plotly computes from the raw values.
+    """
+    df = df.dropna(subset=[column])
+    grouped = df.groupby(by, observed=True)
+    codes = grouped.ngroup().to_numpy()
+    values = df[column].to_numpy(dtype='float64')
+    keep = codes >= 0
+    codes, values = codes[keep], values[keep]
+    values = values[np.lexsort((values, codes))]
+
+    counts = np.bincount(codes, minlength=grouped.ngroups)
+    starts = np.cumsum(counts) - counts
+    stats = pd.DataFrame({'count': counts}, index=grouped.size().index)
+    stats['min'] = values[starts]
+    for name, q in QUARTILES.items():
+        position = np.clip(q * counts - 0.5, 0, counts - 1)
+        below = np.floor(position).astype(np.intp)
+        above = np.ceil(position).astype(np.intp)
+        fraction = position - below
+        stats[name] = (1 - fraction) * values[starts + below] + fraction * values[starts + above]
+    stats['max'] = values[starts + counts - 1]
+    return stats.reset_index()
+
+
+def exact_boxes(df, row_index, thresholds, skill):
+    """Return the exact box plot summary of ``skill`` and its salaries, sorted, by box."""
+    expanded = expand_salaries(df.iloc[row_index.rows(skill=skill)])
+    sizes = top_company_sizes(expanded.groupby('company_size_label', observed=True)['salary'].max())
+    expanded = expanded[expanded['company_size_label'].isin(sizes)]
+    expanded['applies_category'] = categorize_applies(expanded['applies'].to_numpy(), thresholds[skill])
+    salaries = {
+        key: np.sort(values.to_numpy(dtype='float64'))
+        for key, values in expanded.groupby(BOX_KEYS, observed=True)['salary']
+    }
+    return box_statistics(expanded, BOX_KEYS, 'salary'), salaries
+
+
+def rank(values, value):
+    # Mid-rank of value among the sorted values, as a fraction of them.
+    return (np.searchsorted(values, value, 'left') + np.searchsorted(values, value, 'right')) / 2 / len(values)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('data_path', nargs='?', default=None)
+    parser.add_argument('--compression', type=float, default=200)
+    args = parser.parse_args()
+
+    df = read_postings(args.data_path or dataset_path(DATA_PATH))
+    start = time.perf_counter()
+    salaries = SalaryAggregates(df, compression=args.compression)
+    build_seconds = time.perf_counter() - start
+    row_index = RowIndex(df)
+
+    errors, rank_errors, query_seconds = [], [], []
+    exact_boxes_checked = 0
+    for skill in row_index.skills:
+        start = time.perf_counter()
+        approx, _ = salaries.box_statistics(skill)
+        query_seconds.append(time.perf_counter() - start)
+        exact, box_salaries = exact_boxes(df, row_index, salaries.applies_thresholds, skill)
+        merged = exact.merge(
+            approx.astype({key: exact[key].dtype for key in BOX_KEYS}), on=BOX_KEYS, suffixes=('', '_sketch'))
+        assert len(merged) == len(exact) and (merged['count'] == merged['count_sketch']).all()
+        small = (merged['count'] <= args.compression).to_numpy()
+        for column in QUARTILES:
+            mismatched = ~np.isclose(merged[column], merged[f'{column}_sketch'], rtol=1e-12, atol=0) & small
+            if mismatched.any():
+                box = merged[mismatched].iloc[0]
+                sys.exit(f'{skill}, {box.applies_category!r}, {box.company_size_label}: {box["count"]} salaries, '
+                         f'{column} {box[f"{column}_sketch"]} instead of {box[column]}')
+        exact_boxes_checked += small.sum()
+        large = merged[~small]
+        for column, q in QUARTILES.items():
+            errors.append(np.abs(large[column] - large[f'{column}_sketch']) / large[column])
+            rank_errors += [
+                abs(rank(box_salaries[key], sketched) - rank(box_salaries[key], value))
+                for key, value, sketched in zip(
+                    zip(large['applies_category'], large['company_size_label']), large[column], large[f'{column}_sketch'])
+            ]
+
+    errors = np.concatenate(errors)
+    rank_errors = np.array(rank_errors)
+    centroids = np.diff(salaries._offsets)
+    print(f'{len(df):,} postings, {len(salaries.groups):,} sketch groups, compression {args.compression:g}')
+    print(f'build: {build_seconds:.3f} s')
+    print(f'memory: {salaries.nbytes / 1e6:.2f} MB total, '
+          f'{salaries.nbytes / len(salaries.groups):.0f} B per group on average, '
+          f'{centroids.max() * 16} B for the largest group')
+    print(f'boxes of at most {args.compression:g} salaries: {exact_boxes_checked} match the exact quartiles')
+    if len(rank_errors):
+        print(f'larger boxes: {len(rank_errors) // len(QUARTILES)}')
+        print(f'  quartile relative error: median {np.median(errors):.2e}, p99 {np.quantile(errors, 0.99):.2e}, '
+              f'max {errors.max():.2e}')
+        print(f'  quartile rank error: median {np.median(rank_errors):.2e}, p99 {np.quantile(rank_errors, 0.99):.2e}, '
+              f'max {rank_errors.max():.2e}')
+    print(f'box plot query: median {np.median(query_seconds) * 1e3:.1f} ms, max {max(query_seconds) * 1e3:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
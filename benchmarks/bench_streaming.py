@@ -0,0 +1,112 @@
+"""Check that streaming ingestion stays within its memory cap on an export several times larger.
+
+Writes a synthetic CSV export with ``synthetic.write``, builds its
+aggregates with ``ingest.stream_aggregates`` in a fresh interpreter, and
+reports the peak memory the build added to that interpreter. The run fails
+when the peak exceeds the cap, when the cap is below the floor the running
+totals set (the build warns with ``ingest.MemoryBudgetWarning``), or when a
+streamed build of a small export, forced through many chunks, differs from a
+whole-file build.
+
+    python benchmarks/bench_streaming.py [--rows 12000000] [--max-memory 320M] [--whole]
+
+``--whole`` also measures the whole-file build of the same export.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import warnings
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import synthetic  # noqa: E402
+from ingest import MemoryBudgetWarning, parse_size, stream_aggregates  # noqa: E402
+from snapshot import build_aggregates  # noqa: E402
+
+# The running totals grow with the count cube's cells, most of them per
+# company, and set a floor under the peak that no cap lowers: few companies
+# keep that floor below the cap, so the cap measures the chunking.
+COMPANIES = 50
+
+# Peak memory the build adds to an interpreter that has already imported it,
+# and the warnings it gave. VmHWM is the peak of this process's own memory,
+# unlike ru_maxrss, which keeps the peak of the process it was forked from.
+MEASURE = '''
+import json
+import time
+import warnings
+import psutil
+from {module} import {function}
+
+def peak_rss():
+    with open('/proc/self/status') as status:
+        return next(int(line.split()[1]) * 1024 for line in status if line.startswith('VmHWM:'))
+
+baseline = psutil.Process().memory_info().rss
+start = time.perf_counter()
+with warnings.catch_warnings(record=True) as caught:
+    warnings.simplefilter('always')
+    {function}({args})
+elapsed = time.perf_counter() - start
+print(json.dumps([elapsed, peak_rss() - baseline, [str(warning.message) for warning in caught]]))
+'''
+
+
+def measure(module, function, *args):
+    code = MEASURE.format(module=module, function=function, args=', '.join(map(repr, args)))
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def check_equal(path):
+    # A budget this small forces the export through chunks of the minimum size.
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', MemoryBudgetWarning)
+        streamed_cube, streamed = stream_aggregates(path, 1)
+    cube, salaries = build_aggregates(path)
+    pd.testing.assert_frame_equal(streamed_cube.cells, cube.cells, check_dtype=False)
+    pd.testing.assert_frame_equal(streamed_cube.job_cells, cube.job_cells, check_dtype=False)
+    pd.testing.assert_frame_equal(streamed.summaries, salaries.summaries, check_dtype=False)
+    pd.testing.assert_series_equal(
+        streamed.applies_thresholds, salaries.applies_thresholds, check_dtype=False, check_index_type=False)
+    pd.testing.assert_frame_equal(streamed.groups, salaries.groups, check_dtype=False, rtol=1e-9)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=12_000_000)
+    parser.add_argument('--max-memory', default='320M')
+    parser.add_argument('--whole', action='store_true')
+    args = parser.parse_args()
+    max_memory = parse_size(args.max_memory)
+
+    with tempfile.TemporaryDirectory() as directory:
+        small = os.path.join(directory, 'small.csv')
+        synthetic.write(synthetic.Config(50_000, companies=COMPANIES), small)
+        check_equal(small)
+        print('streamed and whole-file aggregates of a 50,000-row export match')
+
+        path = os.path.join(directory, 'postings.csv')
+        synthetic.write(synthetic.Config(args.rows, companies=COMPANIES), path)
+        size = os.path.getsize(path)
+        print(f'export: {args.rows:,} rows, {size / 2**20:,.0f} MiB ({size / max_memory:.1f}x the cap)')
+        print(f'{"build":<12}{"time (s)":>10}{"peak (MiB)":>12}{"cap (MiB)":>11}')
+        elapsed, peak, warned = measure('ingest', 'stream_aggregates', path, max_memory)
+        print(f'{"streaming":<12}{elapsed:>10.2f}{peak / 2**20:>12.0f}{max_memory / 2**20:>11.0f}')
+        if args.whole:
+            whole_elapsed, whole_peak, _ = measure('snapshot', 'build_aggregates', path)
+            print(f'{"whole file":<12}{whole_elapsed:>10.2f}{whole_peak / 2**20:>12.0f}{"":>11}')
+    if warned:
+        sys.exit(f'the cap is below what the aggregates alone need: {warned[0]}')
+    if peak > max_memory:
+        sys.exit(f'streaming peak of {peak / 2**20:.0f} MiB exceeds the {max_memory / 2**20:.0f} MiB cap')
+
+
+if __name__ == '__main__':
+    main()
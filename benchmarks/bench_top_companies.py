@@ -0,0 +1,78 @@
+"""Time the top-companies chart's inputs: count cube queries against the precomputed top-companies table.
+
+For every skill, a sample of states and every work type, resolves the chart's
+fallback selection and its top companies by experience level, once through
+``CountCube`` queries as the chart did before and once through
+``TopCompanies`` lookups, and checks that both give the same rows.
+
+    python benchmarks/bench_top_companies.py [--rows 5000000] [--states 10] [--top 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from aggregates import CountCube  # noqa: E402
+from bench_codes import synthetic_postings  # noqa: E402
+from postings import state_mapping  # noqa: E402
+
+
+def cube_inputs(cube, skill, state, work_types, n):
+    # The chart's inputs from cube queries: the fallback's counts, then the
+    # breakdown of the n companies with the most postings of a known level.
+    counts = [cube.total(skill, state), cube.total(skill=skill), cube.total(state=state)]
+    counts += [len(cube.counts('company_name', *selection)) for selection in [(skill, state), (skill, None), (None, state)]]
+    breakdowns = []
+    for work_type in work_types:
+        data = cube.counts(['company_name', 'formatted_experience_level'], skill, state, work_type)
+        data = data.reset_index(name='job_count')
+        top = data.groupby('company_name', observed=True)['job_count'].sum().nlargest(n).index
+        breakdowns.append(data[data['company_name'].isin(top)].reset_index(drop=True))
+    return counts, breakdowns
+
+
+def table_inputs(table, skill, state, work_types, n):
+    counts = [table.total(skill, state), table.total(skill=skill), table.total(state=state)]
+    counts += [table.company_count(*selection) for selection in [(skill, state), (skill, None), (None, state)]]
+    return counts, [table.breakdown(n, skill, state, work_type) for work_type in work_types]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5_000_000)
+    parser.add_argument('--states', type=int, default=10)
+    parser.add_argument('--top', type=int, default=5)
+    args = parser.parse_args()
+
+    cube = CountCube(synthetic_postings(args.rows))
+    start = time.perf_counter()
+    table = cube.top_companies()
+    built = time.perf_counter() - start
+    work_types = list(cube.dictionaries['formatted_work_type'].labels)
+    selections = [(skill, state) for skill in cube.skills for state in list(state_mapping)[:args.states]]
+
+    results = {}
+    print(f'{args.rows:,} rows, {len(selections)} (skill, state) selections x {len(work_types)} work types')
+    print(f'{"inputs":<14}{"total (s)":>11}{"per selection (ms)":>20}')
+    print(f'{"table build":<14}{built:>11.3f}{"":>20}')
+    for name, inputs, source in [('cube queries', cube_inputs, cube), ('table lookups', table_inputs, table)]:
+        start = time.perf_counter()
+        results[name] = [inputs(source, skill, state, work_types, args.top) for skill, state in selections]
+        elapsed = time.perf_counter() - start
+        print(f'{name:<14}{elapsed:>11.3f}{elapsed / len(selections) * 1000:>20.2f}')
+
+    for (counts, breakdowns), (table_counts, table_breakdowns) in zip(*results.values()):
+        assert counts == table_counts, (counts, table_counts)
+        for breakdown, table_breakdown in zip(breakdowns, table_breakdowns):
+            pd.testing.assert_frame_equal(
+                breakdown.astype(object), table_breakdown.astype(object), check_dtype=False, check_index_type=False)
+    print('cube queries and table lookups match')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""Measure how long the background warm-up takes for different pool sizes.
+
+Each run starts from an empty figure cache and builds every view the
+dashboard can show, as ``VISU_WARMUP=1`` does at server start.
+
+    python benchmarks/bench_warmup.py [--workers 1,2,4,8]
+"""
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from aggregates import CountCube, SalaryAggregates  # noqa: E402
+from figure_cache import FigureCache  # noqa: E402
+from postings import DATA_PATH, dataset_path, file_signature, read_job_skills, state_mapping  # noqa: E402
+from views import Views  # noqa: E402
+from warmup import Warmup, view_tasks  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', default='1,2,4,8')
+    args = parser.parse_args()
+
+    path = dataset_path(os.path.join(ROOT, DATA_PATH))
+    postings = read_job_skills(path)
+    cube, salaries = CountCube(postings), SalaryAggregates(postings.rows())
+    print(f'{"workers":>8}{"views":>8}{"figures":>9}{"MB":>8}{"time (s)":>10}{"views/s":>9}')
+    for workers in [int(n) for n in args.workers.split(',')]:
+        figures = FigureCache()
+        views = Views(cube, salaries, figures, file_signature(path))
+        warmup = Warmup(view_tasks(views, cube.skills, list(state_mapping)), workers).start()
+        warmup.wait()
+        assert not warmup.errors, warmup.errors[0]
+        print(f'{workers:>8}{warmup.total:>8}{len(figures):>9}{figures.nbytes / 1e6:>8.1f}'
+              f'{warmup.elapsed:>10.2f}{warmup.total / warmup.elapsed:>9.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+"""Generate synthetic postings exports at production scale, for the benchmarks.
+
+Writes the export's columns the dashboard reads (``postings.COLUMNS``), one row
+per (job, skill), the rows of a job adjacent as in the real export:
+
+- each job has one to three distinct skills, drawn with Zipf-skewed
+  popularity, as are the companies posting them;
+- a company keeps one size (1 to 7, sometimes missing) across its postings;
+- states, experience levels and work types are drawn uniformly, with missing
+  experience levels at the rate of the sample export;
+- salaries depend on the experience level, and are missing or max-only at
+  configurable rates, as are applies counts.
+
+Rows are generated in chunks by a pool of worker processes, each seeded from
+its chunk number, so the output depends on the seed and not on the number of
+workers. Workers also format their chunk, and the parent writes the chunks in
+order as they complete, holding at most two per worker. CSV or Arrow IPC
+output is chosen from the file extension. Benchmarks that need the rows
+themselves call :func:`generate`, which returns the same rows as one frame.
+
+    python benchmarks/synthetic.py postings.csv [--rows 10000000] [--workers 4] [--companies 20000]
+                                                [--skill-skew 1.0] [--company-skew 1.1] [--missing-salary 0.5]
+"""
+import argparse
+import collections
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pyarrow import csv
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from postings import COLUMNS, NUMERIC_COLUMNS, company_size_mapping, state_mapping  # noqa: E402
+
+SKILLS = [
+    'Information Technology', 'Sales', 'Management', 'Engineering', 'Health Care Provider', 'Finance', 'Marketing',
+    'Design', 'Legal', 'Other', 'other',
+]
+EXPERIENCE_LEVELS = ['Internship', 'Entry level', 'Associate', 'Mid-Senior level', 'Director', 'Executive']
+WORK_TYPES = ['Full-time', 'Part-time', 'Contract', 'Temporary', 'Internship']
+
+# Median salary of each experience level, and the spread around it.
+LEVEL_SALARIES = [45_000, 60_000, 75_000, 100_000, 140_000, 180_000]
+SALARY_SIGMA = 0.25
+# Rates of the sample export.
+MISSING_LEVEL = 0.145
+MISSING_COMPANY_SIZE = 0.1
+MISSING_APPLIES = 0.3
+MAX_ONLY_SALARY = 0.02
+# Distinct skills per job and their odds.
+SKILLS_PER_JOB = [1, 2, 3]
+SKILLS_PER_JOB_ODDS = [0.25, 0.5, 0.25]
+# First job id of an export; ids are unique across it.
+FIRST_JOB_ID = 3_000_000_000
+
+
+def zipf_weights(n, skew):
+    """Return the probabilities of ranks 1 to ``n`` under a Zipf law of exponent ``skew`` (0 is uniform)."""
+    weights = 1.0 / np.arange(1, n + 1) ** skew
+    return weights / weights.sum()
+
+
+class Config:
+    """What to generate: ``rows`` in chunks of ``chunk_rows``, and the shape of the data."""
+
+    def __init__(self, rows, chunk_rows=500_000, companies=20_000, skill_skew=1.0, company_skew=1.1,
+                 missing_salary=0.5, missing_applies=MISSING_APPLIES, seed=0, first_job_id=FIRST_JOB_ID):
+        self.rows = rows
+        self.chunk_rows = chunk_rows
+        self.companies = companies
+        self.skill_skew = skill_skew
+        self.company_skew = company_skew
+        self.missing_salary = missing_salary
+        self.missing_applies = missing_applies
+        self.seed = seed
+        # Job ids run from first_job_id to below first_job_id + rows.
+        self.first_job_id = first_job_id
+
+    @property
+    def chunks(self):
+        return -(-self.rows // self.chunk_rows)
+
+    def company_sizes(self):
+        # One size per company, the same in every worker.
+        rng = np.random.default_rng([self.seed, 2**32 - 1])
+        sizes = rng.integers(1, len(company_size_mapping) + 1, self.companies).astype('float64')
+        return np.where(rng.random(self.companies) < MISSING_COMPANY_SIZE, np.nan, sizes)
+
+
+def _categorical(codes, categories):
+    # Every chunk shares the categories, so Arrow batches share their dictionaries.
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+
+def generate_chunk(config, number, company_sizes=None):
+    """Return the rows of chunk ``number`` of ``config`` as a frame with :data:`postings.COLUMNS`."""
+    rng = np.random.default_rng([config.seed, number])
+    n_rows = min(config.chunk_rows, config.rows - number * config.chunk_rows)
+    jobs = n_rows  # enough jobs for n_rows rows at one skill each; the surplus is cut
+    skills_per_job = rng.choice(SKILLS_PER_JOB, jobs, p=SKILLS_PER_JOB_ODDS)
+    jobs = int(np.searchsorted(np.cumsum(skills_per_job), n_rows) + 1)
+    skills_per_job = skills_per_job[:jobs]
+
+    # Distinct skills per job, by Zipf popularity: the top keys of log weights
+    # plus Gumbel noise are a weighted sample without replacement.
+    keys = np.log(zipf_weights(len(SKILLS), config.skill_skew)) + rng.gumbel(size=(jobs, len(SKILLS)))
+    ranked = np.argsort(-keys, axis=1)[:, :max(SKILLS_PER_JOB)]
+    skill = ranked[np.arange(max(SKILLS_PER_JOB)) < skills_per_job[:, None]][:n_rows]
+    job = np.repeat(np.arange(jobs), skills_per_job)[:n_rows]
+
+    company_sizes = config.company_sizes() if company_sizes is None else company_sizes
+    company = rng.choice(config.companies, jobs, p=zipf_weights(config.companies, config.company_skew))
+    level = rng.integers(0, len(EXPERIENCE_LEVELS), jobs)
+    salary = np.array(LEVEL_SALARIES)[level] * rng.lognormal(0, SALARY_SIGMA, jobs)
+    no_salary = rng.random(jobs) < config.missing_salary
+    max_only = ~no_salary & (rng.random(jobs) < MAX_ONLY_SALARY)
+    level = np.where(rng.random(jobs) < MISSING_LEVEL, -1, level)
+    applies = np.where(rng.random(jobs) < config.missing_applies, np.nan, rng.poisson(5, jobs))
+
+    frame = pd.DataFrame({
+        'job_id': config.first_job_id + number * config.chunk_rows + job,
+        'skill_name': _categorical(skill, SKILLS),
+        'state': _categorical(rng.integers(0, len(state_mapping), jobs)[job], list(state_mapping)),
+        'company_name': _categorical(company[job], [f'Company {i}' for i in range(config.companies)]),
+        'company_size': company_sizes[company][job],
+        'formatted_experience_level': _categorical(level[job], EXPERIENCE_LEVELS),
+        'formatted_work_type': _categorical(rng.integers(0, len(WORK_TYPES), jobs)[job], WORK_TYPES),
+        'min_salary': np.where(no_salary | max_only, np.nan, np.round(salary * 0.8))[job],
+        'max_salary': np.where(no_salary, np.nan, np.round(salary * 1.2))[job],
+        'applies': applies[job],
+        'views': rng.poisson(30, jobs)[job].astype('float64'),
+    })
+    # Salaries are whole dollars, so the export's narrow dtypes hold them exactly.
+    return frame.astype(NUMERIC_COLUMNS)[COLUMNS]
+
+
+def generate(config):
+    """Return every row of ``config`` as one frame, in this process."""
+    company_sizes = config.company_sizes()
+    return pd.concat(
+        [generate_chunk(config, number, company_sizes) for number in range(config.chunks)], ignore_index=True)
+
+
+def _formatted_chunk(config, number, company_sizes, fmt):
+    frame = generate_chunk(config, number, company_sizes)
+    if fmt == 'csv':
+        sink = pa.BufferOutputStream()
+        csv.write_csv(pa.RecordBatch.from_pandas(frame, preserve_index=False), sink,
+                      csv.WriteOptions(include_header=number == 0, quoting_style='none'))
+        return sink.getvalue()
+    # NaN stays a value in float columns, as postings.convert writes them.
+    return pa.RecordBatch.from_arrays([
+        pa.array(frame[column].to_numpy(), from_pandas=False) if column in NUMERIC_COLUMNS
+        else pa.array(frame[column], from_pandas=True) for column in COLUMNS
+    ], names=COLUMNS)
+
+
+def output_format(path):
+    return 'arrow' if os.path.splitext(path)[1] in ('.arrow', '.feather') else 'csv'
+
+
+def write(config, path, workers=None):
+    """Write the export of ``config`` to ``path`` (``.csv``, or ``.arrow`` for Arrow IPC) with ``workers`` processes."""
+    fmt = output_format(path)
+    company_sizes = config.company_sizes()
+    tmp_path = path + '.tmp'
+    writer = None
+    with ProcessPoolExecutor(workers or os.cpu_count()) as pool, open(tmp_path, 'wb') as f:
+        pending = collections.deque()
+        for number in range(config.chunks):
+            pending.append(pool.submit(_formatted_chunk, config, number, company_sizes, fmt))
+            while pending and (len(pending) >= 2 * pool._max_workers or number == config.chunks - 1):
+                chunk = pending.popleft().result()
+                if fmt == 'csv':
+                    f.write(chunk)
+                    continue
+                if writer is None:
+                    writer = pa.ipc.new_file(f, chunk.schema)
+                writer.write_batch(chunk)
+        if writer is not None:
+            writer.close()
+    os.replace(tmp_path, path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('output', help='.csv, or .arrow for Arrow IPC')
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--chunk-rows', type=int, default=500_000)
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per CPU)')
+    parser.add_argument('--companies', type=int, default=20_000)
+    parser.add_argument('--skill-skew', type=float, default=1.0, help='Zipf exponent of skill popularity')
+    parser.add_argument('--company-skew', type=float, default=1.1, help='Zipf exponent of company popularity')
+    parser.add_argument('--missing-salary', type=float, default=0.5, help='share of jobs without a salary')
+    parser.add_argument('--missing-applies', type=float, default=MISSING_APPLIES)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    config = Config(
+        args.rows, args.chunk_rows, args.companies, args.skill_skew, args.company_skew, args.missing_salary,
+        args.missing_applies, args.seed,
+    )
+    start = time.perf_counter()
+    write(config, args.output, args.workers)
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(args.output)
+    print(f'wrote {args.rows:,} rows to {args.output} ({size / 2**20:,.0f} MiB) in {elapsed:.1f} s '
+          f'({args.rows / elapsed / 1e6:.2f}M rows/s)')
+
+
+if __name__ == '__main__':
+    main()
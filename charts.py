@@ -0,0 +1,193 @@
+"""Plotly figure builders for the dashboard charts."""
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from aggregates import APPLIES_CATEGORIES
+
+# Experience levels in seniority order.
+EXPERIENCE_LEVELS = ["Internship", "Entry level", "Associate", "Mid-Senior level", "Director", "Executive"]
+
+SKILL_COLORS = [
+    '#D3F4FF', '#B2DFFB', '#B1E8ED', '#C6CBEF', '#CDFFEB',
+    '#E8D3FF', '#C6CFFF', '#A6E3E9', '#DEECFF', '#F3F8FF',
+]
+OTHER_NODE_COLOR = "rgba(0, 0, 0, 0.1)"  # Light grey for experience level nodes
+
+EXPERIENCE_COLORS = {
+    "Internship": "#DAE1E7",
+    "Entry level": "#AEDADD",
+    "Associate": "#9ecae1",
+    "Mid-Senior level": "#6baed6",
+    "Director": "#3182bd",
+    "Executive": "#08519c"
+}
+
+APPLIES_COLORS = dict(zip(APPLIES_CATEGORIES, ['#9ecae1', '#4292c6', '#08306b']))
+
+
+def format_label(value):
+    if value >= 1000:
+        return f'{int(round(value/1000))}K'
+    else:
+        return f'{int(value)}'
+
+
+def choropleth_figure(state_job_counts):
+    """Build the job count map from a frame of ``state`` and ``job_count``, binned into three colour ranges."""
+    state_job_counts = state_job_counts.copy()
+    min_job_count = state_job_counts['job_count'].min()
+    max_job_count = state_job_counts['job_count'].max()
+    num_bins = 3
+    if max_job_count == min_job_count:
+        max_job_count += 1
+    color_ranges = pd.cut(state_job_counts['job_count'], bins=num_bins, retbins=True)[1]
+
+    labels = [f'{(format_label(color_ranges[i]))} - {(format_label(color_ranges[i+1]))}' for i in range(len(color_ranges) - 1)]
+    state_job_counts['color_label'] = pd.cut(state_job_counts['job_count'],
+                                            bins=color_ranges,
+                                            labels=labels,
+                                            include_lowest=True)
+    colors = [ '#deebf7', '#6baed6','#3182bd',
+    ]
+    color_map = {label: colors[i] for i, label in enumerate(labels)}
+
+    state_job_counts['color'] = state_job_counts['color_label'].map(color_map)
+
+    ticktext = labels
+    tickvals = list(range(len(labels)))
+
+    fig = px.choropleth(
+        state_job_counts,
+        locations='state',
+        locationmode='USA-states',
+        color='color_label', 
+        scope='usa',
+        color_discrete_map=color_map,  
+        labels={'job_count': 'Job Count', 'color_label': 'Job Count Range'},  
+        category_orders={"color_label": labels}  
+    )
+    fig.update_geos(projection_type="albers usa")
+    fig.update_traces(
+        hovertemplate='<b>%{location}</b><br>Job Count=%{customdata[0]}<extra></extra>',
+        customdata=state_job_counts[['job_count', 'state']]
+    )
+
+    fig.update_layout(coloraxis_colorbar=dict(
+        title="Open Jobs",
+        tickvals=tickvals,
+        ticktext=ticktext,
+        lenmode="pixels", len=300, yanchor="top", y=1,
+        ticks="outside"
+    ))
+    return fig
+
+
+def sankey_figure(top_skills, flows):
+    """Build the skill -> experience level Sankey diagram.
+
+    ``top_skills`` lists the skills to show, most frequent first, and ``flows``
+    has one row per (``skill_name``, ``formatted_experience_level``) with its
+    ``count``. Nodes are the skills in ``top_skills`` order followed by the
+    experience levels in seniority order, so the same inputs always give the
+    same figure. Skill colours cycle through :data:`SKILL_COLORS`.
+    """
+    observed_levels = pd.unique(flows['formatted_experience_level'].astype(object))
+    levels = [level for level in EXPERIENCE_LEVELS if level in observed_levels]
+    levels += sorted(level for level in observed_levels if level not in EXPERIENCE_LEVELS)
+
+    source = pd.Categorical(flows['skill_name'].astype(object), categories=top_skills).codes
+    target = len(top_skills) + pd.Categorical(flows['formatted_experience_level'].astype(object), categories=levels).codes
+    order = np.lexsort((target, source))
+
+    skill_colors = np.resize(np.array(SKILL_COLORS, dtype=object), len(top_skills))
+    node_colors = np.concatenate([skill_colors, np.full(len(levels), OTHER_NODE_COLOR, dtype=object)])
+    return go.Figure(data=[go.Sankey(
+        node=dict(
+            pad=15,
+            thickness=20,
+            line=dict(color="black", width=0.5),
+            label=list(top_skills) + levels,
+            color=node_colors.tolist()
+        ),
+        link=dict(
+            source=source[order].tolist(),
+            target=target[order].tolist(),
+            value=flows['count'].to_numpy()[order].tolist(),
+            color=skill_colors[source[order]].tolist()
+        )
+    )])
+
+
+def top_companies_figure(company_experience_data):
+    """Build the stacked bar chart of the top companies' postings, split by experience level.
+
+    ``company_experience_data`` has one row per (``company_name``,
+    ``formatted_experience_level``) of the companies to show, with its
+    ``job_count``, as :meth:`~aggregates.TopCompanies.breakdown` returns them.
+    """
+    top_data = company_experience_data.sort_values('job_count', ascending=False)
+    fig3 = px.bar(
+        top_data,
+        x='company_name',
+        y='job_count',
+        color='formatted_experience_level',
+        labels={'job_count': 'Job Count', 'company_name': 'Company', 'formatted_experience_level': 'Experience Level'},
+        barmode='stack',
+        color_discrete_map=EXPERIENCE_COLORS,
+        category_orders={
+            'formatted_experience_level': EXPERIENCE_LEVELS
+        },
+        hover_data={'company_name': False}
+    )
+    fig3.update_layout(
+        xaxis=dict(
+            title='Company',
+            tickangle=-45,
+            automargin=True,
+        ),
+        yaxis=dict(
+            title='Job Count',
+            range=[0, top_data['job_count'].max() + 10]
+        )
+    )
+    return fig3
+
+
+def salary_box_figure(box_stats, company_size_sorted):
+    """Build the salary box plot from :meth:`~aggregates.SalaryAggregates.box_statistics` output.
+
+    Only the per-box summary is sent to the browser, never the salaries
+    themselves. With points off, Plotly draws whiskers to the min and max, so
+    those are the fences.
+    """
+    fig = go.Figure()
+    for applies_category, color in APPLIES_COLORS.items():
+        category_stats = box_stats[box_stats['applies_category'] == applies_category]
+        if category_stats.empty:
+            continue
+        fig.add_trace(go.Box(
+            x=category_stats['company_size_label'].astype(str).tolist(),
+            q1=category_stats['q1'], median=category_stats['median'], q3=category_stats['q3'],
+            lowerfence=category_stats['min'], upperfence=category_stats['max'],
+            name=applies_category, legendgroup=applies_category, offsetgroup=applies_category,
+            alignmentgroup='True', marker_color=color, boxpoints=False, notched=False, orientation='v',
+            hovertemplate=f'Applies Category={applies_category}<br>Company Size=%{{x}}<br>Salary=%{{y}}<extra></extra>'
+        ))
+    fig.update_layout(
+        boxmode='group',
+        legend=dict(title=dict(text='Applies Category'), tracegroupgap=0),
+        margin=dict(t=60),
+        xaxis=dict(categoryorder='array', categoryarray=company_size_sorted)
+    )
+    fig.update_layout(
+        xaxis_title='Company Size',
+        yaxis_title='Salary',
+        xaxis_tickangle=-45,
+        showlegend=True,
+        height=600,
+        width=800,
+        yaxis_range=[0, box_stats['max'].max() + 20000]  
+    )
+    return fig
@@ -0,0 +1,299 @@
+"""Incremental appends of new postings to the dashboard's aggregates.
+
+New postings arrive as delta CSVs, with the export's columns, in a directory
+next to the export (``<export>.deltas``):
+
+    python deltas.py add delta.csv [--csv main_df_subset.csv]
+
+A :class:`LiveDataset` loads the export's aggregates once and folds in each
+delta as it appears. Postings whose (``job_id``, ``skill_name``) was already
+seen are skipped; the rest are merged into copies of the aggregates, so the
+work per delta follows the size of the delta rather than of the history. The
+copies are then published as a new :class:`DatasetVersion` in one reference
+swap: a rerun that has already read the current version finishes on it, and
+the next rerun sees the new one.
+
+A replaced export is picked up the same way: :meth:`LiveDataset.watch` checks
+for a new export or new deltas in a background thread, rebuilds the
+aggregates there and swaps them in once complete. The old version is freed as
+soon as no rerun holds it any more.
+"""
+import argparse
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+
+import ingest
+from postings import COLUMNS, DATA_PATH, add_derived_columns, dataset_path, file_signature, read_csv
+from snapshot import load_aggregates
+
+# Columns that identify a posting's skill; a delta row repeating a known pair is dropped.
+KEY_COLUMNS = ['job_id', 'skill_name']
+
+WATCH_INTERVAL_ENV = 'VISU_WATCH_INTERVAL'
+DEFAULT_WATCH_INTERVAL = 5.0
+
+# Rows of the export read at a time while indexing its keys.
+_KEY_CHUNK_ROWS = 1_000_000
+
+
+def watch_interval_from_env(environ=os.environ):
+    """Return the seconds between checks for a changed export or new deltas, from ``VISU_WATCH_INTERVAL``."""
+    return float(environ.get(WATCH_INTERVAL_ENV) or DEFAULT_WATCH_INTERVAL)
+
+
+def deltas_dir(csv_path):
+    """Return the directory holding the delta CSVs of ``csv_path``."""
+    return os.path.splitext(csv_path)[0] + '.deltas'
+
+
+def key_hashes(df):
+    """Return a 64-bit hash of the (``job_id``, ``skill_name``) of every row of ``df``.
+
+    Hashed from plain values, so the hash of a pair does not depend on the
+    dtype or categories of the frame it was read into.
+    """
+    keys = pd.DataFrame({
+        'job_id': df['job_id'].to_numpy(dtype='float64'),
+        'skill_name': df['skill_name'].astype(object).to_numpy(),
+    })
+    return pd.util.hash_pandas_object(keys, index=False).to_numpy()
+
+
+def _history_keys(csv_path):
+    # Sorted key hashes and distinct job ids of the export, read a few columns and rows at a time.
+    path = dataset_path(csv_path)
+    if path.endswith('.arrow'):
+        table = feather.read_table(path, columns=KEY_COLUMNS, memory_map=True)
+        chunks = (batch.to_pandas() for batch in table.to_batches(_KEY_CHUNK_ROWS))
+    else:
+        chunks = pd.read_csv(path, usecols=KEY_COLUMNS, chunksize=_KEY_CHUNK_ROWS)
+    hashes, job_ids = [np.empty(0, dtype=np.uint64)], [np.empty(0)]
+    for chunk in chunks:
+        hashes.append(key_hashes(chunk))
+        job_ids.append(np.unique(chunk['job_id'].to_numpy(dtype='float64')))
+    return np.sort(np.concatenate(hashes)), np.unique(np.concatenate(job_ids))
+
+
+def _isin_sorted(values, sorted_values):
+    positions = np.minimum(np.searchsorted(sorted_values, values), max(len(sorted_values) - 1, 0))
+    return sorted_values[positions] == values if len(sorted_values) else np.zeros(len(values), dtype=bool)
+
+
+def delta_names(directory):
+    """Return the delta CSVs in ``directory``, in the order they were added."""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return sorted(name for name in names if name.endswith('.csv') and not name.startswith('.'))
+
+
+def add_delta(source, csv_path=DATA_PATH):
+    """Queue the delta CSV at ``source`` for ``csv_path`` and return its path in the deltas directory.
+
+    The file is checked for the export's columns, then copied under a temporary
+    name and renamed into place, so a dashboard never reads it half-written.
+    """
+    missing = [column for column in COLUMNS if column not in pd.read_csv(source, nrows=0).columns]
+    if missing:
+        raise ValueError(f'{source} lacks the columns {", ".join(missing)}')
+    directory = deltas_dir(csv_path)
+    os.makedirs(directory, exist_ok=True)
+    names = delta_names(directory)
+    number = int(os.path.splitext(names[-1])[0]) + 1 if names else 1
+    path = os.path.join(directory, f'{number:06d}.csv')
+    tmp_path = os.path.join(directory, f'.{number:06d}.csv.tmp')
+    shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+class DatasetVersion:
+    """The aggregates of the export with ``signature`` once ``number`` deltas have added postings.
+
+    Never modified once published; ``key`` identifies it in cache keys.
+    """
+
+    __slots__ = ('number', 'signature', 'count_cube', 'salary_aggregates')
+
+    def __init__(self, number, signature, count_cube, salary_aggregates):
+        self.number = number
+        self.signature = signature
+        self.count_cube = count_cube
+        self.salary_aggregates = salary_aggregates
+
+    @property
+    def key(self):
+        return self.signature + (self.number,)
+
+
+class LiveDataset:
+    """The aggregates of the export at ``csv_path`` plus every delta queued for it.
+
+    ``current`` is the latest :class:`DatasetVersion`. :meth:`refresh` reloads
+    the export when it has changed on disk and folds in the deltas added since
+    the last call, then publishes the result as the new ``current``. One
+    caller at a time does that work, whatever the number of callers: the others
+    carry on with the version they find. :meth:`watch` calls it from a
+    background thread, off every session's path. ``appended`` and
+    ``duplicates`` count the delta rows kept and skipped since the export was
+    loaded, ``reloads`` the reloads of the export and ``error`` the last
+    failure.
+    """
+
+    def __init__(self, csv_path=DATA_PATH, max_memory=None):
+        self.csv_path = csv_path
+        self.max_memory = max_memory
+        self.directory = deltas_dir(csv_path)
+        self.reloads = 0
+        self.error = None
+        self._failed_signature = None
+        self._watcher = None
+        self._lock = threading.Lock()
+        with self._lock:
+            self.current = self._load(self.source_signature())
+
+    def source_signature(self):
+        """Return the :func:`~postings.file_signature` of the file the export is loaded from."""
+        return file_signature(dataset_path(self.csv_path))
+
+    def pending(self):
+        """Return the names of the queued deltas not applied yet."""
+        return delta_names(self.directory)[len(self.applied):]
+
+    def refresh(self):
+        """Bring the dataset up to date, unless another caller is already at it, and return the current version."""
+        if self._lock.acquire(blocking=False):
+            try:
+                signature = self.source_signature()
+                if signature != self.current.signature and signature != self._failed_signature:
+                    self._reload(signature)
+                else:
+                    # Published one delta at a time, so a failing delta keeps the ones before it.
+                    for name in self.pending():
+                        self.current = self._apply(name, self.current)
+            finally:
+                self._lock.release()
+        return self.current
+
+    def watch(self, interval=DEFAULT_WATCH_INTERVAL):
+        """Refresh every ``interval`` seconds in a daemon thread; return this dataset.
+
+        A changed export is only reloaded once its signature has held for one
+        interval, so a file still being written is not read.
+        """
+        if self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, args=(interval,), name='dataset-watcher', daemon=True)
+            self._watcher.start()
+        return self
+
+    def _watch(self, interval):
+        previous = None
+        while True:
+            time.sleep(interval)
+            try:
+                signature = self.source_signature()
+            except OSError:
+                # Between the removal and the replacement of the export.
+                previous = None
+                continue
+            if signature == previous:
+                try:
+                    self.refresh()
+                except Exception as error:
+                    # A delta that cannot be applied; retried on the next check.
+                    self.error = error
+            previous = signature
+
+    def _reload(self, signature):
+        # The previous version stays current until the new one is complete,
+        # and keeps its deltas' bookkeeping if the new one fails.
+        names = ['applied', 'appended', 'duplicates', '_history', '_history_jobs', '_seen', '_seen_jobs']
+        state = {name: getattr(self, name) for name in names}
+        try:
+            version = self._load(signature)
+        except Exception as error:
+            self.__dict__.update(state)
+            self.error = error
+            self._failed_signature = signature
+            return
+        self.error = None
+        self._failed_signature = None
+        self.reloads += 1
+        self.current = version
+
+    def _load(self, signature):
+        # The export's aggregates, plus every queued delta. Deltas the export
+        # already includes are skipped as duplicates.
+        count_cube, salary_aggregates = load_aggregates(self.csv_path, max_memory=self.max_memory)
+        self.applied = []
+        self.appended = 0
+        self.duplicates = 0
+        # Key hashes and job ids of the export, indexed on the first delta, and of the rows appended since.
+        self._history = self._history_jobs = None
+        self._seen = set()
+        self._seen_jobs = set()
+        version = DatasetVersion(0, signature, count_cube, salary_aggregates)
+        for name in self.pending():
+            version = self._apply(name, version)
+        return version
+
+    def _new_rows(self, rows):
+        # Rows whose (job, skill) pair is new, and which of them start a new job.
+        if self._history is None:
+            self._history, self._history_jobs = _history_keys(self.csv_path)
+        hashes = key_hashes(rows)
+        seen = np.fromiter((key in self._seen for key in hashes.tolist()), dtype=bool, count=len(hashes))
+        new = ~(_isin_sorted(hashes, self._history) | seen | pd.Series(hashes).duplicated().to_numpy())
+        job_ids = rows['job_id'].to_numpy(dtype='float64')[new]
+        seen_jobs = np.fromiter((job_id in self._seen_jobs for job_id in job_ids.tolist()), dtype=bool, count=len(job_ids))
+        new_jobs = ~(_isin_sorted(job_ids, self._history_jobs) | seen_jobs | pd.Series(job_ids).duplicated().to_numpy())
+        return new, new_jobs, hashes
+
+    def _apply(self, name, version):
+        rows = add_derived_columns(read_csv(os.path.join(self.directory, name)))
+        new, new_jobs, hashes = self._new_rows(rows)
+        rows = rows[new].reset_index(drop=True)
+        jobs = rows[new_jobs]
+        if len(rows):
+            count_cube = version.count_cube.appended(rows, jobs)
+            # Built before the version is published, off the readers' path.
+            count_cube.top_companies()
+            version = DatasetVersion(
+                version.number + 1, version.signature, count_cube, version.salary_aggregates.appended(rows))
+        self._seen.update(hashes[new].tolist())
+        self._seen_jobs.update(jobs['job_id'].to_numpy(dtype='float64').tolist())
+        self.appended += len(rows)
+        self.duplicates += int((~new).sum())
+        self.applied.append(name)
+        return version
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    add_parser = commands.add_parser('add', help='queue a delta CSV of new postings for a running dashboard')
+    add_parser.add_argument('delta_path')
+    add_parser.add_argument('--csv', default=DATA_PATH, help='export the delta extends (default: %(default)s)')
+    check_parser = commands.add_parser('check', help='apply the queued deltas and report what they add')
+    check_parser.add_argument('csv_path', nargs='?', default=DATA_PATH)
+    check_parser.add_argument('--max-memory', type=ingest.parse_size, default=ingest.max_memory_from_env(),
+                              help='stream the CSV within this many bytes, e.g. 512M (default: $VISU_MAX_MEMORY)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'add':
+        print(f'Queued {add_delta(args.delta_path, args.csv)}')
+    elif args.command == 'check':
+        dataset = LiveDataset(args.csv_path, args.max_memory)
+        print(f'{len(dataset.applied)} deltas: {dataset.appended:,} postings appended, '
+              f'{dataset.duplicates:,} duplicates skipped, version {dataset.current.number}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Integer codes for the string dimensions of the postings.
+
+A :class:`Dictionary` maps the labels of one dimension (skills, states,
+companies, experience levels, work types) to small integer codes. Codes are
+only ever added, so codes handed out by one load, chunk or delta stay valid
+after the next one: aggregates store codes, filter and group on them, and
+decode labels only in what they return.
+"""
+import numpy as np
+import pandas as pd
+
+
+class Dictionary:
+    """Append-only mapping between the labels of one dimension and integer codes, with -1 for missing.
+
+    Codes follow the order labels were first seen in. The code of each label
+    and the rank of each code in label order are derived once per growth of
+    the dictionary, so lookups and sorted results cost no more than a take.
+    """
+
+    def __init__(self, labels=()):
+        self._set_labels(pd.Index(list(labels), dtype=object))
+
+    def _set_labels(self, labels):
+        self.labels = labels
+        self._codes = self._dtype = self._ranks = None
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getstate__(self):
+        # Snapshots store the labels only; the lookups are derived again on use.
+        return {'labels': self.labels}
+
+    def __setstate__(self, state):
+        self._set_labels(state['labels'])
+
+    def copy(self):
+        """Return a dictionary with the same codes, that can grow without changing this one."""
+        dictionary = Dictionary.__new__(Dictionary)
+        dictionary.__dict__.update(self.__dict__)
+        return dictionary
+
+    def encode(self, values):
+        """Return the codes of ``values`` (categorical or labels), adding the labels seen for the first time."""
+        categorical = values.array if isinstance(values, pd.Series) else values
+        if not isinstance(categorical, pd.Categorical):
+            categorical = pd.Categorical(categorical)
+        categories = categorical.categories.astype(object)
+        new = categories.difference(self.labels, sort=False)
+        if len(new):
+            self._set_labels(self.labels.append(new))
+        codes = categorical.codes
+        return np.where(codes >= 0, self.labels.get_indexer(categories)[codes], -1).astype(np.int32)
+
+    def code(self, label):
+        """Return the code of ``label``, or ``None`` when it was never seen."""
+        if self._codes is None:
+            self._codes = dict(zip(self.labels, range(len(self.labels))))
+        return self._codes.get(label)
+
+    def decode(self, codes):
+        """Return the labels of ``codes`` as an object array, ``NaN`` for missing."""
+        codes = np.asarray(codes)
+        labels = np.append(self.labels.to_numpy(), np.nan)
+        return labels[np.where(codes >= 0, codes, len(self))]
+
+    def dtype(self):
+        """Return the categorical dtype of every label, sorted as a whole-file load infers them."""
+        if self._dtype is None:
+            self._dtype = pd.CategoricalDtype(self.labels.sort_values())
+        return self._dtype
+
+    def ranks(self):
+        """Return the position of each code's label among the categories of :meth:`dtype`."""
+        if self._ranks is None:
+            self._ranks = self.dtype().categories.get_indexer(self.labels)
+        return self._ranks
+
+    def categorical(self, codes, dtype=None):
+        """Return ``codes`` as a categorical of ``dtype`` (by default :meth:`dtype`)."""
+        remap = self.ranks() if dtype is None else dtype.categories.get_indexer(self.labels)
+        codes = np.asarray(codes)
+        return pd.Categorical.from_codes(
+            np.where(codes >= 0, remap[np.maximum(codes, 0)], -1), dtype=dtype or self.dtype())
+
+
+def pack(columns, radices):
+    """Pack code ``columns`` (each below its radix, -1 for missing) into one int64 per row.
+
+    Grouping or sorting on the packed key orders rows by the columns in turn.
+    The radices must count the missing code, and their product stay below 2**63.
+    """
+    packed = np.zeros(len(columns[0]) if len(columns) else 0, dtype=np.int64)
+    for codes, radix in zip(columns, radices):
+        packed = packed * radix + (np.asarray(codes).astype(np.int64) + 1)
+    return packed
+
+
+def unpack(packed, radices):
+    """Return the code columns packed into ``packed`` by :func:`pack`, each in the narrowest type that fits."""
+    columns = []
+    for radix in reversed(radices):
+        packed, code = np.divmod(packed, radix)
+        columns.append((code - 1).astype(np.min_scalar_type(-radix)))
+    return columns[::-1]
@@ -0,0 +1,97 @@
+"""A process-wide cache of built dashboard figures, bounded by memory rather than entry count."""
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 64 * 2**20
+
+
+def figure_nbytes(fig):
+    """Return the size of ``fig`` as the length of its JSON encoding.
+
+    That is what the figure costs to send to the browser, and a stable proxy for
+    the memory its data arrays hold.
+    """
+    return len(fig.to_json(validate=False))
+
+
+class FigureCache:
+    """Least-recently-used cache of figures keyed by their inputs.
+
+    Keys must include everything the figure depends on, including the dataset
+    fingerprint, so a new dataset never hits a figure built from the old one.
+    Entries are evicted oldest-first once their total size exceeds
+    ``max_bytes``; a single figure larger than the budget is built but not kept.
+    Safe to share between sessions: cached figures must be treated as read-only.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, sizeof=figure_nbytes):
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the figure cached under ``key`` and mark it recently used, or ``None``."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, fig):
+        """Cache ``fig`` under ``key``, evicting least recently used figures to stay within budget."""
+        size = self._sizeof(fig)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.nbytes -= previous[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (fig, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.nbytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_build(self, key, build):
+        """Return the figure cached under ``key``, calling ``build()`` and caching its result on a miss.
+
+        Concurrent misses on the same key may each build the figure; the last
+        one to finish is kept.
+        """
+        fig = self.get(key)
+        if fig is None:
+            fig = build()
+            self.put(key, fig)
+        return fig
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        """Return the cache's counters and current size."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self.nbytes,
+                'max_bytes': self.max_bytes,
+            }
@@ -0,0 +1,322 @@
+"""Streaming ingestion of postings exports too large to load at once.
+
+:func:`stream_aggregates` builds the same aggregates as loading the export and
+aggregating it, but reads the CSV in chunks sized to a memory budget and folds
+each chunk into running totals, so the full table is never held in memory.
+"""
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from aggregates import (
+    CELL_MERGE, DIMENSIONS, GROUP_MERGE, JOB_DIMENSIONS, SKETCH_DIMENSIONS, SUMMARY_MERGE, CountCube, SalaryAggregates,
+    compress_groups, expand_salaries, salary_summaries,
+)
+from dictionary import Dictionary, pack, unpack
+from postings import CATEGORICAL_COLUMNS, add_derived_columns, company_size_mapping
+from sketches import DEFAULT_COMPRESSION
+
+MAX_MEMORY_ENV = 'VISU_MAX_MEMORY'
+
+# Columns the aggregates are built from, and the dtypes they are read with.
+AGGREGATE_COLUMNS = [
+    'job_id', 'skill_name', 'state', 'company_name', 'company_size', 'formatted_experience_level', 'formatted_work_type',
+    'min_salary', 'max_salary', 'applies',
+]
+_DTYPES = {
+    **{column: 'category' for column in CATEGORICAL_COLUMNS},
+    **{column: 'float64' for column in ['job_id', 'company_size', 'min_salary', 'max_salary', 'applies']},
+}
+
+# Working memory of a chunk, as a multiple of its size as text plus parsed: the
+# parser's buffers, the expanded salary rows and the group keys and sort orders
+# built from them.
+_CHUNK_FACTOR = 6
+# Working memory of a fold, as a multiple of the running totals' size: the
+# concatenated totals and the groupby built over them.
+_TOTALS_FACTOR = 4
+_SAMPLE_ROWS = 10_000
+_COMPRESS_BLOCK_ROWS = 2**16
+# Queued parts are merged once they add up to 1/_MERGE_RATIO of their total's
+# rows: merging more often costs time, less often peak memory.
+_MERGE_RATIO = 4
+_MIN_CHUNK_ROWS = 10_000
+
+# Radices of the code columns that are not encoded per export, counting -1 for missing.
+_CODE_RADICES = {'company_size_label': len(company_size_mapping) + 1}
+_UNITS = {'': 1, 'K': 2**10, 'M': 2**20, 'G': 2**30}
+
+
+class MemoryBudgetWarning(RuntimeWarning):
+    """The running totals of a streaming build needed more memory than its budget."""
+
+
+def parse_size(text):
+    """Parse a byte count such as ``'512M'`` or ``'2G'`` (binary units)."""
+    text = text.strip().upper().removesuffix('B')
+    unit = text[-1] if text and text[-1] in _UNITS else ''
+    return int(float(text[:len(text) - len(unit)]) * _UNITS[unit])
+
+
+def max_memory_from_env(environ=os.environ):
+    """Return the memory budget set by ``VISU_MAX_MEMORY``, or ``None`` to load exports whole."""
+    value = environ.get(MAX_MEMORY_ENV)
+    return parse_size(value) if value else None
+
+
+def _read_csv(csv_path, **kwargs):
+    return pd.read_csv(csv_path, usecols=AGGREGATE_COLUMNS, dtype=_DTYPES, **kwargs)
+
+
+def row_size(csv_path):
+    """Return the estimated bytes per row of ``csv_path`` while a chunk is parsed: its text plus its parsed columns."""
+    sample = _read_csv(csv_path, nrows=_SAMPLE_ROWS)
+    with open(csv_path, 'rb') as f:
+        f.readline()
+        text = sum(len(line) for line, _ in zip(f, range(len(sample))))
+    return (text + sample.memory_usage(deep=True).sum()) / max(len(sample), 1)
+
+
+def _pack(frame, keys, radices):
+    # One int64 per row for the code columns ``keys``: grouping on it takes a
+    # fraction of the memory of grouping on the columns.
+    return pack([frame[key].to_numpy() for key in keys], radices)
+
+
+def _unpack(packed, keys, radices):
+    # Code columns take the narrowest type their radix fits, as running totals
+    # hold them until the end.
+    return pd.DataFrame(dict(zip(keys, unpack(packed, radices))))
+
+
+def _fold(frames, keys, merge, radices=None):
+    """Merge ``frames``, each one row per ``keys``, into one, combining the other columns with ``merge``.
+
+    ``frames`` is emptied as soon as it has been concatenated, so the inputs can
+    be freed while the merge runs. With ``radices``, the keys are code columns
+    below them and are grouped on as one packed integer.
+    """
+    frame = pd.concat(frames, ignore_index=True)
+    frames.clear()
+    if radices is None or np.prod(radices, dtype='float64') >= 2**63:
+        return frame.groupby(keys, sort=False).agg(merge).reset_index()
+    packed = _pack(frame, keys, radices)
+    frame = frame[list(merge)]
+    totals = frame.groupby(packed, sort=False).agg(merge)
+    del frame, packed
+    return pd.concat([_unpack(totals.index.to_numpy(), keys, radices), totals.reset_index(drop=True)], axis=1)
+
+
+def _fold_centroids(frames, radices, compression):
+    """Merge ``frames`` of centroids (sketch key codes, ``mean`` and ``weight``) and compress them per sketch group."""
+    keys = np.concatenate([_pack(frame, SKETCH_DIMENSIONS, radices) for frame in frames])
+    means, weights = (np.concatenate([frame[column].to_numpy() for frame in frames]) for column in ['mean', 'weight'])
+    frames.clear()
+    order = np.lexsort((means, keys))
+    keys, means, weights = keys[order], means[order], weights[order]
+    del order
+    # Compress a block of whole groups at a time, to bound the temporaries.
+    cuts = np.unique(np.searchsorted(keys, keys[::_COMPRESS_BLOCK_ROWS]))
+    blocks = [
+        compress_groups(keys[start:stop], means[start:stop], weights[start:stop], compression)
+        for start, stop in zip(cuts, [*cuts[1:], len(keys)])
+    ]
+    if blocks:
+        keys, means, weights = (np.concatenate(arrays) for arrays in zip(*blocks))
+    centroids = _unpack(keys, SKETCH_DIMENSIONS, radices)
+    centroids['mean'] = means
+    centroids['weight'] = weights
+    return centroids
+
+
+def _chunk_cells(chunk, dimensions, offset):
+    # Count cube cells of chunk, whose first row is at position offset.
+    cells = chunk[dimensions].assign(first_row=np.arange(offset, offset + len(chunk)))
+    cells = cells.groupby(dimensions, sort=False)['first_row'].agg(['size', 'min'])
+    return cells.set_axis(['count', 'first_row'], axis=1).reset_index()
+
+
+class _Ingest:
+    """State of one streaming build: the column dictionaries, the running totals and the memory budget."""
+
+    def __init__(self, csv_path, max_memory, compression):
+        self.csv_path = csv_path
+        self.max_memory = max_memory
+        self.compression = compression
+        self.row_size = row_size(csv_path)
+        # Applies counts are encoded too, as the salary sketches are grouped by them.
+        self.dictionaries = {column: Dictionary() for column in [*CATEGORICAL_COLUMNS, 'applies']}
+        self.totals = {}
+        self.pending = {}
+        self.merges = {}
+        # The most memory the totals and a chunk of the minimum size needed at once.
+        self.floor = 0
+
+    def _nbytes(self):
+        frames = list(self.totals.values()) + [part for parts in self.pending.values() for part in parts]
+        return sum(frame.memory_usage(deep=True).sum() for frame in frames)
+
+    def chunk_rows(self):
+        # Rows that fit in what the running totals leave of the budget.
+        totals = _TOTALS_FACTOR * self._nbytes()
+        self.floor = max(self.floor, totals + _MIN_CHUNK_ROWS * self.row_size * _CHUNK_FACTOR)
+        return max(_MIN_CHUNK_ROWS, int((self.max_memory - totals) / (self.row_size * _CHUNK_FACTOR)))
+
+    def chunks(self):
+        """Yield consecutive chunks, with categorical columns replaced by integer codes.
+
+        The rows of a chunk's last job are held back for the next chunk, so the
+        rows of a job, adjacent in the export, are never split between chunks.
+        """
+        held = None
+        with _read_csv(self.csv_path, chunksize=_MIN_CHUNK_ROWS) as reader:
+            while True:
+                try:
+                    chunk = reader.get_chunk(self.chunk_rows())
+                except StopIteration:
+                    if held is not None:
+                        yield held
+                    return
+                chunk = add_derived_columns(chunk)
+                coded = pd.DataFrame({
+                    column: self.dictionaries[column].encode(chunk[column]) for column in CATEGORICAL_COLUMNS
+                })
+                coded['company_size_label'] = chunk['company_size_label'].cat.codes.to_numpy()
+                for column in ['job_id', 'min_salary', 'max_salary', 'applies']:
+                    coded[column] = chunk[column].to_numpy()
+                del chunk
+                if held is not None:
+                    coded = pd.concat([held, coded], ignore_index=True)
+                job_ids = coded['job_id'].to_numpy()
+                other_jobs = np.flatnonzero(job_ids != job_ids[-1])
+                cut = other_jobs[-1] + 1 if len(other_jobs) else 0
+                held = coded.iloc[cut:].copy()
+                if cut:
+                    yield coded.iloc[:cut]
+
+    def fold(self, name, part, merge):
+        """Queue the per-chunk ``part`` of table ``name``, to be merged into its total by ``merge(frames)``.
+
+        Parts are merged into the total only once they add up to a fixed
+        fraction of its rows, so each row is merged a logarithmic number of
+        times rather than once per chunk.
+        """
+        self.merges[name] = merge
+        parts = self.pending.setdefault(name, [])
+        parts.append(part)
+        total = self.totals.get(name)
+        if _MERGE_RATIO * sum(map(len, parts)) >= (0 if total is None else len(total)):
+            self.merge(name)
+
+    def radices(self, keys):
+        """Return the radix of each code column in ``keys``, or ``None`` when one of them holds values instead."""
+        if not all(key in self.dictionaries or key in _CODE_RADICES for key in keys):
+            return None
+        return [len(self.dictionaries[key]) + 1 if key in self.dictionaries else _CODE_RADICES[key] for key in keys]
+
+    def merger(self, keys, merge):
+        # Radices are read when the merge runs, after the dictionaries have seen every part.
+        return lambda frames: _fold(frames, keys, merge, self.radices(keys))
+
+    def merge(self, name):
+        # The merge owns the only references to its inputs, and drops them once
+        # it has copied them out.
+        frames = self.pending.pop(name, [])
+        if name in self.totals:
+            frames.insert(0, self.totals.pop(name))
+        self.totals[name] = self.merges[name](frames)
+
+    def flush(self):
+        for name in list(self.pending):
+            self.merge(name)
+
+    def read(self):
+        # Counts, salary summaries and salary sketches.
+        def merge_centroids(frames):
+            return _fold_centroids(frames, self.radices(SKETCH_DIMENSIONS), self.compression)
+
+        rows = jobs = 0
+        for chunk in self.chunks():
+            # Repeated (job, skill) rows are dropped, as JobSkills drops them.
+            chunk = chunk[~chunk.duplicated(['job_id', 'skill_name']).to_numpy()]
+            first_rows = chunk[~chunk['job_id'].duplicated().to_numpy()]
+            self.fold('cells', _chunk_cells(chunk, DIMENSIONS, rows), self.merger(DIMENSIONS, CELL_MERGE))
+            self.fold(
+                'job_cells', _chunk_cells(first_rows, JOB_DIMENSIONS, jobs), self.merger(JOB_DIMENSIONS, CELL_MERGE))
+            rows += len(chunk)
+            jobs += len(first_rows)
+            del first_rows
+            self.fold('summaries', salary_summaries(chunk), self.merger(['skill_name', 'state'], SUMMARY_MERGE))
+
+            expanded = expand_salaries(chunk, keys=['skill_name', 'state', 'company_size_label'])
+            expanded['applies'] = self.dictionaries['applies'].encode(expanded['applies'].astype('category'))
+            stats = expanded.groupby(SKETCH_DIMENSIONS, sort=False)['salary'].agg(['count', 'sum', 'min', 'max'])
+            self.fold('stats', stats.reset_index(), self.merger(SKETCH_DIMENSIONS, GROUP_MERGE))
+            # Each chunk is compressed on its own before it is queued: merged
+            # t-digests keep their accuracy.
+            points = expanded[SKETCH_DIMENSIONS].assign(mean=expanded['salary'].to_numpy(dtype='float64'), weight=1.0)
+            self.fold('centroids', merge_centroids([points]), merge_centroids)
+        self.flush()
+
+    def decode(self, frame, dtypes):
+        """Replace ``frame``'s code columns by categoricals of ``dtypes``, as a whole-file load would have them."""
+        for column, dtype in dtypes.items():
+            if column not in frame:
+                continue
+            codes = frame[column].to_numpy()
+            if column in self.dictionaries:
+                frame[column] = self.dictionaries[column].categorical(codes, dtype)
+            else:
+                frame[column] = pd.Categorical.from_codes(codes, dtype=dtype)
+        return frame
+
+
+def stream_aggregates(csv_path, max_memory, compression=DEFAULT_COMPRESSION):
+    """Return ``(count_cube, salary_aggregates)`` for the CSV export at ``csv_path``, reading it in chunks.
+
+    Each chunk is sized so that it, the running totals and the work of merging
+    them stay within ``max_memory`` bytes. The totals grow with the number of
+    distinct cells and sketch groups, not with the rows: once merging them
+    alone needs more than the budget, chunks stay at a floor of ten thousand
+    rows and the peak is set by the aggregates instead, and the build warns
+    with a :class:`MemoryBudgetWarning` giving the memory they needed. Counts,
+    salary summaries, mins and maxes match a whole-file build exactly, provided
+    the rows of each job are adjacent, as the export writes them: repeated jobs
+    and (job, skill) pairs are only recognized within a job's run of rows. The
+    salary sketches are merged chunk by chunk, so the quartiles of boxes of more
+    than ``compression`` salaries carry the usual sketch error.
+    """
+    ingest = _Ingest(csv_path, max_memory, compression)
+    ingest.read()
+    if ingest.floor > max_memory:
+        warnings.warn(
+            f'the aggregates of {csv_path} need about {ingest.floor / 2**20:.0f} MiB, more than the '
+            f'{max_memory / 2**20:.0f} MiB budget', MemoryBudgetWarning, stacklevel=2,
+        )
+
+    # The count cube keeps the codes; the salary tables are decoded.
+    cells, job_cells = ingest.totals.pop('cells'), ingest.totals.pop('job_cells')
+    count_cube = CountCube.from_cells(cells, job_cells, ingest.dictionaries)
+    del cells, job_cells
+    dtypes = {column: dictionary.dtype() for column, dictionary in ingest.dictionaries.items()}
+    dtypes['company_size_label'] = pd.CategoricalDtype(list(company_size_mapping.values()), ordered=True)
+    totals = {name: ingest.decode(total, dtypes) for name, total in ingest.totals.items()}
+    ingest.totals.clear()
+    for name in ['stats', 'centroids']:
+        totals[name]['applies'] = totals[name]['applies'].astype('float64')
+
+    # Regrouping by the decoded categoricals orders every table the way a
+    # whole-file build does.
+    summaries = totals.pop('summaries').groupby(
+        ['skill_name', 'state'], observed=True, dropna=False).agg(SUMMARY_MERGE).reset_index()
+    groups = totals.pop('stats').groupby(SKETCH_DIMENSIONS, observed=True, dropna=False).agg(GROUP_MERGE).reset_index()
+    centroids = totals.pop('centroids')
+    codes = centroids.groupby(SKETCH_DIMENSIONS, observed=True, dropna=False).ngroup().to_numpy()
+    means, weights = centroids['mean'].to_numpy(), centroids['weight'].to_numpy()
+    order = np.lexsort((means, codes))
+    salary_aggregates = SalaryAggregates.from_parts(
+        summaries, groups, codes[order], means[order], weights[order], compression,
+    )
+    return count_cube, salary_aggregates
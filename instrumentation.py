@@ -0,0 +1,162 @@
+"""Opt-in instrumentation of the dashboard's sections: a debug panel and a rotating log.
+
+Enabled for every session with the ``VISU_INSTRUMENT`` environment variable,
+or for one session by opening the dashboard with ``?instrument=1``. For each
+section of :data:`timing.SECTIONS` it records, per rerun, the wall time, the
+rows of aggregates read to build its output (none when its figure came from
+the cache), the peak memory allocated and the size of the figure sent to the
+browser.
+
+The session's latest measures are shown in a collapsible panel at the foot of
+the sidebar, and every measure is appended as a JSON line to a rotating log,
+``VISU_INSTRUMENT_LOG`` (by default ``instrumentation.log``).
+
+With ``VISU_INSTRUMENT``, the process measures every section and traces
+allocations with :mod:`tracemalloc` from its first rerun until it exits, which
+slows every session it serves. A session instrumented by its query parameter
+reports no peak memory, as tracing would slow the other sessions too, and the
+sections of every session are timed only until the last such session ends.
+Otherwise a section costs the check of an empty list.
+"""
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+import tracemalloc
+
+import pandas as pd
+import streamlit as st
+from streamlit import runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+import timing
+
+ENABLED_ENV = 'VISU_INSTRUMENT'
+LOG_ENV = 'VISU_INSTRUMENT_LOG'
+QUERY_PARAM = 'instrument'
+DEFAULT_LOG = 'instrumentation.log'
+# The log rotates at this size, keeping this many older files.
+LOG_MAX_BYTES = 5 * 2**20
+LOG_BACKUPS = 3
+# Measures noted by the sections, in the panel's column order.
+MEASURES = ['rows', 'peak_bytes', 'figure_bytes']
+
+_TRUE = ('1', 'true', 'yes', 'on')
+# Session state holding the session's run count and latest measures per section.
+_STATE_KEY = '_instrumentation'
+
+_logger = None
+_install_lock = threading.Lock()
+# Ids of the sessions instrumented by their query parameter, and whether _record listens.
+_sessions = set()
+_listening = False
+
+
+def enabled(environ=os.environ):
+    return environ.get(ENABLED_ENV, '').lower() in _TRUE
+
+
+def log_path(environ=os.environ):
+    return environ.get(LOG_ENV) or DEFAULT_LOG
+
+
+def session_enabled():
+    """Return whether the current session is instrumented, by the environment or its query parameter."""
+    return enabled() or st.query_params.get(QUERY_PARAM, '').lower() in _TRUE
+
+
+def install(path=None):
+    """Set up the log at ``path``, once per process.
+
+    With ``VISU_INSTRUMENT``, also measure every section and trace allocations
+    from now on; otherwise :func:`begin_run` measures sections while sessions
+    instrumented by their query parameter are open.
+    """
+    global _logger
+    with _install_lock:
+        if _logger is not None:
+            return
+        handler = logging.handlers.RotatingFileHandler(
+            path or log_path(), maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger = logging.getLogger('visu.instrumentation')
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.addHandler(handler)
+        _logger = logger
+        if enabled():
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            _listen()
+
+
+def _listen():
+    # Called with _install_lock held.
+    global _listening
+    if not _listening:
+        timing.add_listener(_record)
+        _listening = True
+
+
+def _prune():
+    # Stops listening once every session instrumented by its query parameter
+    # has ended. Without a runtime, as under AppTest, sessions never end.
+    global _listening
+    if enabled() or not runtime.exists():
+        return
+    with _install_lock:
+        instance = runtime.get_instance()
+        _sessions.difference_update({session for session in _sessions if not instance.is_active_session(session)})
+        if not _sessions and _listening:
+            timing.remove_listener(_record)
+            _listening = False
+
+
+def begin_run():
+    """Count a new full rerun of the current session; call it after :func:`install`, before the first section."""
+    state = st.session_state.setdefault(_STATE_KEY, {'run': 0, 'sections': {}})
+    state['run'] += 1
+    ctx = get_script_run_ctx()
+    if ctx is not None and not enabled():
+        with _install_lock:
+            _sessions.add(ctx.session_id)
+            _listen()
+
+
+def _record(measured):
+    # Called in the thread that ran the section: only sections of instrumented
+    # sessions are kept, not those of other sessions or background threads.
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None or _STATE_KEY not in ctx.session_state:
+        _prune()
+        return
+    state = ctx.session_state[_STATE_KEY]
+    entry = {
+        'session': ctx.session_id,
+        'run': state['run'],
+        'section': measured.section,
+        'ms': measured.seconds * 1e3,
+        **{name: measured.measures[name] for name in MEASURES if name in measured.measures},
+    }
+    state['sections'][measured.section] = entry
+    _logger.info(json.dumps({'time': time.time(), **entry}))
+
+
+def panel():
+    """Show the session's latest measures of each section in a collapsible sidebar panel."""
+    state = st.session_state.get(_STATE_KEY)
+    if state is None:
+        return
+    with st.sidebar.expander('Instrumentation'):
+        entries = [state['sections'][section] for section in timing.SECTIONS if section in state['sections']]
+        table = pd.DataFrame(entries, columns=['section', 'run', 'ms'] + MEASURES)
+        st.dataframe(table, hide_index=True, column_config={
+            'ms': st.column_config.NumberColumn(format='%.1f'),
+            'peak_bytes': st.column_config.NumberColumn('peak bytes'),
+            'figure_bytes': st.column_config.NumberColumn('figure bytes'),
+        })
+        peak = '' if tracemalloc.is_tracing() else f' Peak memory is only traced with {ENABLED_ENV} set.'
+        st.caption(f"Rerun {state['run']}. A chart's own reruns show here on the next full rerun; "
+                   f"every measure is logged to {log_path()}.{peak}")
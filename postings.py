@@ -0,0 +1,284 @@
+"""Loading and preparation of the LinkedIn postings dataset used by the dashboard.
+
+The raw export is a CSV. ``python postings.py convert`` writes a typed Arrow IPC
+(Feather v2) copy next to it, which the dashboard loads instead of the CSV for
+as long as it is up to date with the CSV it was converted from.
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+DATA_PATH = 'main_df_subset.csv'
+
+# Columns the dashboard reads. The Arrow file keeps every column of the export,
+# but only these are loaded.
+COLUMNS = [
+    'job_id', 'skill_name', 'state', 'company_name', 'company_size', 'formatted_experience_level',
+    'formatted_work_type', 'min_salary', 'max_salary', 'applies', 'views',
+]
+
+# String dimensions stored as categoricals.
+CATEGORICAL_COLUMNS = ['skill_name', 'state', 'company_name', 'formatted_experience_level', 'formatted_work_type']
+
+# Numeric columns and the narrow dtype they are stored as. A column only takes the
+# narrow dtype when every value survives the round trip, so no salary is rounded.
+NUMERIC_COLUMNS = {
+    'min_salary': 'float32',
+    'max_salary': 'float32',
+    'applies': 'float32',
+    'views': 'float32',
+    'company_size': 'float32',
+}
+
+# Schema metadata recording which CSV a columnar file was converted from.
+_SOURCE_MTIME_KEY = b'visu.source_mtime_ns'
+_SOURCE_SIZE_KEY = b'visu.source_size'
+
+state_mapping = {
+    'NJ': 'New Jersey', 'IL': 'Illinois', 'NY': 'New York', 'CA': 'California', 'PA': 'Pennsylvania',
+    'WI': 'Wisconsin', 'WA': 'Washington', 'NC': 'North Carolina', 'OH': 'Ohio', 'GA': 'Georgia',
+    'KY': 'Kentucky', 'FL': 'Florida', 'MD': 'Maryland', 'TX': 'Texas', 'VA': 'Virginia',
+    'MI': 'Michigan', 'SD': 'South Dakota', 'IN': 'Indiana', 'NE': 'Nebraska', 'MO': 'Missouri',
+    'MA': 'Massachusetts', 'TN': 'Tennessee', 'LA': 'Louisiana', 'DC': 'District of Columbia',
+    'AR': 'Arkansas', 'OK': 'Oklahoma', 'UT': 'Utah', 'MN': 'Minnesota', 'AZ': 'Arizona', 'CT': 'Connecticut',
+    'RI': 'Rhode Island', 'ME': 'Maine', 'NH': 'New Hampshire', 'CO': 'Colorado', 'AL': 'Alabama',
+    'KS': 'Kansas', 'ID': 'Idaho', 'HI': 'Hawaii', 'OR': 'Oregon', 'NV': 'Nevada', 'NM': 'New Mexico',
+    'VT': 'Vermont', 'IA': 'Iowa', 'SC': 'South Carolina', 'DE': 'Delaware', 'ND': 'North Dakota',
+    'MS': 'Mississippi', 'WY': 'Wyoming', 'MT': 'Montana', 'AK': 'Alaska'
+}
+
+# Reverse mapping for filtering purposes
+reverse_state_mapping = {v: k for k, v in state_mapping.items()}
+
+# Company size mapping
+company_size_mapping = {
+    1.0: '2-50 employees',
+    2.0: '51-200 employees',
+    3.0: '201-500 employees',
+    4.0: '501-1000 employees',
+    5.0: '1001-5000 employees',
+    6.0: '5001-10,000 employees',
+    7.0: '10,001+ employees'
+}
+
+
+def file_signature(path):
+    """Return ``(path, mtime_ns, size)`` for ``path``.
+
+    Used as a cache key so that a cached dataset is dropped as soon as the
+    file on disk is replaced or rewritten.
+    """
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+
+def columnar_path(csv_path):
+    """Return the path of the columnar copy of ``csv_path``."""
+    return os.path.splitext(csv_path)[0] + '.arrow'
+
+
+def _downcast(series, dtype):
+    values = pd.to_numeric(series, errors='coerce')
+    narrow = values.astype(dtype)
+    if np.array_equal(narrow.to_numpy(dtype='float64'), values.to_numpy(dtype='float64'), equal_nan=True):
+        return narrow
+    return values
+
+
+def apply_schema(df):
+    """Cast ``df`` to the dashboard's column types, in place."""
+    for column in CATEGORICAL_COLUMNS:
+        if column in df and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype('category')
+    for column, dtype in NUMERIC_COLUMNS.items():
+        if column in df:
+            df[column] = _downcast(df[column], dtype)
+    return df
+
+
+def read_csv(path):
+    """Read the raw CSV export with the dashboard's column types."""
+    df = pd.read_csv(path, dtype={column: 'category' for column in CATEGORICAL_COLUMNS})
+    return apply_schema(df)
+
+
+def convert(csv_path=DATA_PATH, out_path=None):
+    """Convert the CSV export to a typed Arrow IPC file and return its path.
+
+    The CSV's mtime and size are recorded in the file's schema metadata so a
+    later :func:`dataset_path` call can tell when the copy has gone stale. The
+    table is written as a single uncompressed record batch with NaN kept as a
+    value in float columns, so numeric columns can be read back without a copy.
+    """
+    out_path = out_path or columnar_path(csv_path)
+    stat = os.stat(csv_path)
+    df = read_csv(csv_path)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for column in NUMERIC_COLUMNS:
+        if column in df and pd.api.types.is_float_dtype(df[column]):
+            table = table.set_column(
+                table.schema.get_field_index(column), column, pa.array(df[column].to_numpy(), from_pandas=False))
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        _SOURCE_MTIME_KEY: str(stat.st_mtime_ns).encode(),
+        _SOURCE_SIZE_KEY: str(stat.st_size).encode(),
+    })
+    tmp_path = out_path + '.tmp'
+    feather.write_feather(table, tmp_path, compression='uncompressed', chunksize=max(table.num_rows, 1))
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def _is_fresh(arrow_path, csv_path):
+    if not os.path.exists(csv_path):
+        return True
+    try:
+        metadata = pa.ipc.open_file(arrow_path).schema.metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return False
+    stat = os.stat(csv_path)
+    return (metadata.get(_SOURCE_MTIME_KEY) == str(stat.st_mtime_ns).encode()
+            and metadata.get(_SOURCE_SIZE_KEY) == str(stat.st_size).encode())
+
+
+def dataset_path(csv_path=DATA_PATH):
+    """Return the file to load for ``csv_path``.
+
+    That is the columnar copy when it exists and was converted from the current
+    CSV, and the CSV itself otherwise.
+    """
+    arrow_path = columnar_path(csv_path)
+    if os.path.exists(arrow_path) and _is_fresh(arrow_path, csv_path):
+        return arrow_path
+    return csv_path
+
+
+def add_derived_columns(df):
+    """Add the columns the dashboard derives from the raw export, in place.
+
+    State names are not among them: the views show them by looking up the
+    selected state in :data:`state_mapping`.
+    """
+    df['company_size_label'] = pd.Categorical(
+        df['company_size'].map(company_size_mapping),
+        categories=list(company_size_mapping.values()),
+        ordered=True,
+    )
+    return df
+
+
+def _read_arrow(path):
+    # Memory-mapped and converted without consolidating blocks, so numeric
+    # columns stay read-only views of the mapped file instead of private copies.
+    with pa.memory_map(path) as source:
+        names = pa.ipc.open_file(source).schema.names
+    table = feather.read_table(path, columns=[column for column in COLUMNS if column in names], memory_map=True)
+    return table.to_pandas(split_blocks=True)
+
+
+class RowIndex:
+    """Row positions of every skill, state and (skill, state) pair in a postings frame.
+
+    Built once per dataset so that selecting a skill and/or state costs a dict
+    lookup plus the matching rows, instead of a boolean mask over every row.
+    """
+
+    def __init__(self, df):
+        self.size = len(df)
+        self.skills = df['skill_name'].dropna().unique()
+        self._by_skill = df.groupby('skill_name', observed=True).indices
+        self._by_state = df.groupby('state', observed=True).indices
+        self._by_skill_state = df.groupby(['skill_name', 'state'], observed=True).indices
+
+    def rows(self, skill=None, state=None):
+        """Return the ascending row positions matching ``skill`` and ``state`` (``None`` matches all)."""
+        if skill is None and state is None:
+            return np.arange(self.size)
+        if state is None:
+            positions = self._by_skill.get(skill)
+        elif skill is None:
+            positions = self._by_state.get(state)
+        else:
+            positions = self._by_skill_state.get((skill, state))
+        return positions if positions is not None else np.empty(0, dtype=np.intp)
+
+
+class JobSkills:
+    """Postings stored once per job, with an integer-coded job <-> skill bridge.
+
+    The export has one row per (job, skill) and repeats every job column for
+    each skill of a job. ``jobs`` holds one row per distinct ``job_id``, in
+    order of first appearance, with the job columns of its first row. ``bridge``
+    holds one row per distinct (job, skill) pair, in order of first appearance:
+    ``job``, the job's position in ``jobs``, and ``skill_name``. A repeated
+    (job, skill) row is kept once, so counts over either table count each
+    posting once.
+    """
+
+    def __init__(self, jobs, bridge):
+        self.jobs = jobs
+        self.bridge = bridge
+        self._by_skill = bridge.groupby('skill_name', observed=True).indices
+
+    @classmethod
+    def from_rows(cls, df):
+        """Split ``df``, one row per (job, skill) as in the export, into jobs and bridge."""
+        job, _ = pd.factorize(df['job_id'], use_na_sentinel=False)
+        _, first_rows = np.unique(job, return_index=True)
+        jobs = df.iloc[first_rows].drop(columns='skill_name').reset_index(drop=True)
+        bridge = pd.DataFrame({'job': job.astype(np.int32), 'skill_name': df['skill_name'].array})
+        return cls(jobs, bridge[~bridge.duplicated()].reset_index(drop=True))
+
+    def rows(self, skill=None):
+        """Return one row per (job, skill) pair of ``skill`` (``None`` matches all), with the job's columns."""
+        bridge = self.bridge
+        if skill is not None:
+            bridge = bridge.iloc[self._by_skill.get(skill, np.empty(0, dtype=np.intp))]
+        rows = self.jobs.take(bridge['job'].to_numpy()).reset_index(drop=True)
+        rows['skill_name'] = bridge['skill_name'].array
+        return rows
+
+    @property
+    def nbytes(self):
+        """Memory held by the jobs table and the bridge."""
+        return int(self.jobs.memory_usage(deep=True).sum() + self.bridge.memory_usage(deep=True).sum())
+
+
+def read_postings(path=DATA_PATH):
+    """Read the postings at ``path`` (CSV or Arrow IPC) and return them with derived columns.
+
+    Arrow files are memory-mapped; the returned frame must be treated as read-only.
+    """
+    if path.endswith('.arrow'):
+        df = _read_arrow(path)
+    else:
+        df = read_csv(path)
+    return add_derived_columns(df)
+
+
+def read_job_skills(path=DATA_PATH):
+    """Read the postings at ``path`` (CSV or Arrow IPC) as :class:`JobSkills`, with derived columns."""
+    df = _read_arrow(path) if path.endswith('.arrow') else read_csv(path)
+    postings = JobSkills.from_rows(df)
+    add_derived_columns(postings.jobs)
+    return postings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    convert_parser = commands.add_parser('convert', help='write the typed Arrow IPC copy of a CSV export')
+    convert_parser.add_argument('csv_path', nargs='?', default=DATA_PATH)
+    convert_parser.add_argument('-o', '--output', help='output path (default: next to the CSV, with .arrow)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'convert':
+        print(f'Wrote {convert(args.csv_path, args.output)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""On-disk snapshots of the dashboard's aggregates.
+
+Building the count cube and salary aggregates means reading every posting. A
+snapshot stores the built aggregates next to the export, keyed by a hash of the
+export's contents and :data:`~aggregates.AGGREGATES_VERSION`, so a restart with
+the same data loads them directly and never reads the postings.
+
+    python snapshot.py build [csv_path] [--max-memory 512M]
+
+With a memory budget, the aggregates are built by streaming the CSV in chunks
+(see :mod:`ingest`) instead of loading it whole.
+"""
+import argparse
+import hashlib
+import os
+import pickle
+
+import ingest
+from aggregates import AGGREGATES_VERSION, CountCube, SalaryAggregates
+from postings import DATA_PATH, dataset_path, read_job_skills
+
+
+def snapshot_path(csv_path):
+    """Return the path of the aggregate snapshot of ``csv_path``."""
+    return os.path.splitext(csv_path)[0] + '.snapshot'
+
+
+def source_path(csv_path):
+    """Return the file whose contents key the snapshot: the CSV, or its columnar copy when only that exists."""
+    return csv_path if os.path.exists(csv_path) else dataset_path(csv_path)
+
+
+def content_hash(path):
+    """Return the SHA-256 of the file at ``path``."""
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+
+def _source_key(path, header=None):
+    # Hashing a large export takes a while, so the hash recorded in an existing
+    # snapshot is trusted while the file's mtime and size still match it.
+    stat = os.stat(path)
+    if header and header['source_mtime_ns'] == stat.st_mtime_ns and header['source_size'] == stat.st_size:
+        digest = header['source_hash']
+    else:
+        digest = content_hash(path)
+    return {
+        'version': AGGREGATES_VERSION,
+        'source_hash': digest,
+        'source_mtime_ns': stat.st_mtime_ns,
+        'source_size': stat.st_size,
+    }
+
+
+def _matches(header, key):
+    return header is not None and all(header.get(name) == key[name] for name in ('version', 'source_hash'))
+
+
+def read_header(path):
+    """Return the header of the snapshot at ``path``, or ``None`` when there is no readable snapshot."""
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+
+
+def read_snapshot(path):
+    """Return the ``(header, count_cube, salary_aggregates)`` stored at ``path``."""
+    with open(path, 'rb') as f:
+        header = pickle.load(f)
+        count_cube, salary_aggregates = pickle.load(f)
+    return header, count_cube, salary_aggregates
+
+
+def write_snapshot(path, key, count_cube, salary_aggregates):
+    """Write the aggregates to ``path`` with header ``key``, replacing any previous snapshot atomically.
+
+    The header is pickled on its own ahead of the aggregates, so checking
+    whether a snapshot is current does not load it.
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(key, f, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump((count_cube, salary_aggregates), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def build_aggregates(csv_path=DATA_PATH, max_memory=None):
+    """Read the postings for ``csv_path`` and return ``(count_cube, salary_aggregates)``.
+
+    With ``max_memory`` (bytes), the CSV is streamed within that budget;
+    otherwise the postings are loaded whole, from the columnar copy when it is
+    current. The count cube's top-companies table is built too, so snapshots
+    hold it.
+    """
+    if max_memory and os.path.exists(csv_path):
+        count_cube, salary_aggregates = ingest.stream_aggregates(csv_path, max_memory)
+    else:
+        postings = read_job_skills(dataset_path(csv_path))
+        count_cube, salary_aggregates = CountCube(postings), SalaryAggregates(postings.rows())
+    count_cube.top_companies()
+    return count_cube, salary_aggregates
+
+
+def load_aggregates(csv_path=DATA_PATH, path=None, max_memory=None):
+    """Return ``(count_cube, salary_aggregates)`` for ``csv_path``.
+
+    They are loaded from the snapshot at ``path`` (by default next to the CSV)
+    when it was built from the same data by the same aggregation version.
+    Otherwise they are built from the postings, within ``max_memory`` bytes
+    when it is given, and the snapshot is rewritten.
+    """
+    path = path or snapshot_path(csv_path)
+    header = read_header(path)
+    key = _source_key(source_path(csv_path), header)
+    if _matches(header, key):
+        try:
+            _, count_cube, salary_aggregates = read_snapshot(path)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError):
+            pass
+        else:
+            if header != key:
+                # Same data under a new mtime: record it so the next start skips the hash.
+                _try_write(path, key, count_cube, salary_aggregates)
+            return count_cube, salary_aggregates
+    count_cube, salary_aggregates = build_aggregates(csv_path, max_memory)
+    _try_write(path, key, count_cube, salary_aggregates)
+    return count_cube, salary_aggregates
+
+
+def _try_write(path, key, count_cube, salary_aggregates):
+    # A read-only data directory only costs the next start a rebuild.
+    try:
+        write_snapshot(path, key, count_cube, salary_aggregates)
+    except OSError:
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    build_parser = commands.add_parser('build', help='build (or refresh) the aggregate snapshot of a CSV export')
+    build_parser.add_argument('csv_path', nargs='?', default=DATA_PATH)
+    build_parser.add_argument('-o', '--output', help='output path (default: next to the CSV, with .snapshot)')
+    build_parser.add_argument('--max-memory', type=ingest.parse_size, default=ingest.max_memory_from_env(),
+                              help='stream the CSV within this many bytes, e.g. 512M (default: $VISU_MAX_MEMORY)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        path = args.output or snapshot_path(args.csv_path)
+        key = _source_key(source_path(args.csv_path))
+        write_snapshot(path, key, *build_aggregates(args.csv_path, args.max_memory))
+        print(f'Wrote {path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Wall time and measures of the dashboard's sections.
+
+The dashboard wraps each section in :func:`timed`, and code running within a
+section adds what it measured with :func:`note` (rows read, bytes of the
+figure shown). Sections are only measured while a listener is registered, as
+:func:`recording` does for the rerun benchmark and the instrumentation panel
+does, so an ordinary rerun pays for checking an empty list.
+
+While :mod:`tracemalloc` traces, a section also records the peak memory
+allocated while it ran. The peak is process-wide, so sections of concurrent
+sessions inflate each other's.
+"""
+import collections
+import contextlib
+import threading
+import time
+import tracemalloc
+
+# Names of the sections the dashboard times, in page order.
+SECTIONS = ['data_load', 'sidebar', 'choropleth', 'sankey', 'top_companies', 'salary_box']
+
+# One measured section: its name, wall time and the measures noted while it ran.
+Timing = collections.namedtuple('Timing', ['section', 'seconds', 'measures'])
+
+_listeners = []
+_lock = threading.Lock()
+# The measures of the sections open in each thread, innermost last.
+_open = threading.local()
+
+
+@contextlib.contextmanager
+def timed(section):
+    """Time the block (or, as a decorator, the function) as ``section`` and pass its :class:`Timing` to the listeners."""
+    if not _listeners:
+        yield
+        return
+    measures = {}
+    stack = _open.__dict__.setdefault('sections', [])
+    stack.append(measures)
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        allocated = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if tracing and tracemalloc.is_tracing():
+            measures['peak_bytes'] = max(tracemalloc.get_traced_memory()[1] - allocated, 0)
+        stack.pop()
+        for listener in list(_listeners):
+            listener(Timing(section, elapsed, measures))
+
+
+def active():
+    """Return whether a section is being measured in this thread, so costly measures can be skipped otherwise."""
+    return bool(getattr(_open, 'sections', None))
+
+
+def note(**measures):
+    """Add ``measures`` to those of every section open in this thread; does nothing outside a measured section."""
+    for section in getattr(_open, 'sections', ()):
+        for name, value in measures.items():
+            section[name] = section.get(name, 0) + value
+
+
+def add_listener(listener):
+    """Call ``listener(timing)`` with the :class:`Timing` of every section measured from now on, in any session."""
+    with _lock:
+        _listeners.append(listener)
+
+
+def remove_listener(listener):
+    with _lock:
+        _listeners.remove(listener)
+
+
+@contextlib.contextmanager
+def recording():
+    """Collect the :class:`Timing` of every section measured within the block, in a list."""
+    timings = []
+    add_listener(timings.append)
+    try:
+        yield timings
+    finally:
+        remove_listener(timings.append)
@@ -0,0 +1,133 @@
+"""The dashboard's views: the data and figure each selection shows, figures shared through a figure cache.
+
+The data methods are what the figures are built from; the JSON API serves
+them as they are, so its numbers are the dashboard's.
+"""
+import timing
+from charts import choropleth_figure, salary_box_figure, sankey_figure, top_companies_figure
+
+# Number of skills the Sankey diagram shows unless the user picks another.
+DEFAULT_TOP_SKILLS = 5
+
+# Number of companies the top-companies chart shows unless the user picks another.
+DEFAULT_TOP_COMPANIES = 5
+
+# Number of companies the sidebar lists.
+SIDEBAR_TOP_COMPANIES = 5
+
+
+class Views:
+    """Figures for one dataset, looked up in ``figures`` and built from the aggregates on a miss.
+
+    Cache keys are the view name, the selection it depends on and ``signature``,
+    the dataset's :func:`~postings.file_signature` and version. The dashboard
+    and the background warm-up both go through this class, so they share cache
+    entries. The data methods do not use the cache, so ``figures`` may be
+    ``None`` when only they are called, as in the JSON API.
+    """
+
+    def __init__(self, count_cube, salary_aggregates, figures, signature):
+        self.count_cube = count_cube
+        self.salary_aggregates = salary_aggregates
+        self.figures = figures
+        self.signature = signature
+
+    def _figure(self, key, build):
+        return self.figures.get_or_build(key + (self.signature,), build)
+
+    def selection_summary(self, skill, state):
+        """Return the sidebar's numbers for ``skill`` in ``state``, or in every state when it has no postings there.
+
+        A dict of the ``state`` the numbers are for (``None`` for every state),
+        the min, average and max salary, the ``job_count`` and the
+        ``top_companies`` as a series of job counts by company.
+        """
+        if self.count_cube.total(skill, state) == 0:
+            state = None
+        top_companies = self.count_cube.top('company_name', SIDEBAR_TOP_COMPANIES, skill, state)
+        timing.note(rows=len(top_companies))
+        return {
+            'skill': skill,
+            'state': state,
+            **self.salary_aggregates.summary(skill, state),
+            'job_count': self.count_cube.total(skill, state),
+            'top_companies': top_companies,
+        }
+
+    def state_counts(self, skill):
+        """Return the job count of ``skill`` in each state, as ``state`` and ``job_count`` columns."""
+        state_job_counts = self.count_cube.counts('state', skill=skill).reset_index()
+        state_job_counts.columns = ['state', 'job_count']
+        timing.note(rows=len(state_job_counts))
+        return state_job_counts
+
+    def choropleth(self, skill):
+        return self._figure(('choropleth', skill), lambda: choropleth_figure(self.state_counts(skill)))
+
+    def skill_flows(self, state, top_n=DEFAULT_TOP_SKILLS):
+        """Return the ``top_n`` skills of ``state`` and their job counts by experience level."""
+        top_skills, flows = self.count_cube.skill_flows(state, top_n)
+        timing.note(rows=len(flows))
+        return top_skills, flows
+
+    def sankey(self, state, top_n=DEFAULT_TOP_SKILLS):
+        return self._figure(('sankey', state, top_n), lambda: sankey_figure(*self.skill_flows(state, top_n)))
+
+    def bar_selection(self, skill, state):
+        """Return the top-companies chart's ``(skill, state)`` selection and its ``filter_use``.
+
+        The chart falls back from the skill in the state to the skill anywhere, then
+        to the state for every skill, then to every posting, when the narrower
+        selection has no postings or only one company. ``None`` in the
+        selection matches every value.
+        """
+        top_companies = self.count_cube.top_companies()
+        selection = (skill, state)
+        unique_companies = top_companies.company_count(*selection)
+
+        filter_use = "both"
+        if top_companies.total(*selection) == 0:
+            if top_companies.total(skill=skill) > 0:
+                selection = (skill, None)
+                filter_use = "skill"
+            else:
+                selection = (None, state)
+                filter_use = "state"
+                if top_companies.total(state=state) == 0:
+                    selection = (None, None)
+                    filter_use = "Not Both"
+
+        if unique_companies ==1:
+            if top_companies.total(skill=skill) > 0 and top_companies.company_count(skill=skill) !=1:
+                selection = (skill, None)
+                filter_use = "skill"
+            else:
+                selection = (None, state)
+                if top_companies.company_count(state=state) !=1:
+                    filter_use = "state"
+        return selection, filter_use
+
+    def work_types(self, selection):
+        """Return the work types of the ``(skill, state)`` selection, in order of appearance."""
+        return self.count_cube.in_order_of_appearance('formatted_work_type', *selection)
+
+    def company_breakdown(self, selection, work_type, n=DEFAULT_TOP_COMPANIES):
+        """Return the job counts by experience level of the ``n`` top companies of the selection and ``work_type``."""
+        company_experience_data = self.count_cube.top_companies().breakdown(n, *selection, work_type=work_type)
+        timing.note(rows=len(company_experience_data))
+        return company_experience_data
+
+    def top_companies(self, selection, work_type, n=DEFAULT_TOP_COMPANIES):
+        return self._figure(
+            ('top_companies', *selection, work_type, n),
+            lambda: top_companies_figure(self.company_breakdown(selection, work_type, n)),
+        )
+
+    def salary_statistics(self, skill):
+        """Return the salary box plot's statistics for ``skill`` and the company sizes they cover."""
+        stats, sizes = self.salary_aggregates.box_statistics(skill)
+        timing.note(rows=len(stats))
+        return stats, sizes
+
+    def salary_box(self, skill):
+        return self._figure(('salary_box', skill), lambda: salary_box_figure(*self.salary_statistics(skill)))
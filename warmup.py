@@ -0,0 +1,105 @@
+"""Background warm-up of the figure cache.
+
+Builds every view a user can reach (each skill, state and skill x state
+selection, with every work type of the top-companies chart) in a thread pool,
+so that the first visitor to a rare combination finds its figures cached.
+Enabled with the ``VISU_WARMUP`` environment variable; ``VISU_WARMUP_WORKERS``
+sets the pool size.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from views import DEFAULT_TOP_SKILLS
+
+ENABLED_ENV = 'VISU_WARMUP'
+WORKERS_ENV = 'VISU_WARMUP_WORKERS'
+
+
+def enabled(environ=os.environ):
+    return environ.get(ENABLED_ENV, '').lower() in ('1', 'true', 'yes', 'on')
+
+
+def default_workers(environ=os.environ):
+    return int(environ.get(WORKERS_ENV) or os.cpu_count() or 1)
+
+
+def view_tasks(views, skills, states):
+    """Return one callable per skill, per state and per (skill, state) that builds its views."""
+    def skill_views(skill):
+        views.choropleth(skill)
+        views.salary_box(skill)
+
+    def state_views(state):
+        views.sankey(state, min(DEFAULT_TOP_SKILLS, len(skills)))
+
+    def selection_views(skill, state):
+        selection, _ = views.bar_selection(skill, state)
+        for work_type in views.work_types(selection):
+            views.top_companies(selection, work_type)
+
+    tasks = [lambda skill=skill: skill_views(skill) for skill in skills]
+    tasks += [lambda state=state: state_views(state) for state in states]
+    tasks += [lambda skill=skill, state=state: selection_views(skill, state) for skill in skills for state in states]
+    return tasks
+
+
+class Warmup:
+    """Runs ``tasks`` in a pool of ``workers`` threads and tracks their progress.
+
+    :meth:`start` returns immediately. ``done`` counts finished tasks, failed
+    ones included (their exceptions are kept in ``errors``), and ``elapsed`` is
+    the time since the start, frozen once every task has finished.
+    """
+
+    def __init__(self, tasks, workers=None):
+        self.tasks = list(tasks)
+        self.workers = workers or default_workers()
+        self.total = len(self.tasks)
+        self.done = 0
+        self.errors = []
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+        self._started_at = None
+        self._finished_at = None
+
+    def start(self):
+        self._started_at = time.perf_counter()
+        if not self.tasks:
+            self._finish()
+            return self
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='warmup')
+        for task in self.tasks:
+            executor.submit(self._run, task)
+        executor.shutdown(wait=False)
+        return self
+
+    def _run(self, task):
+        try:
+            task()
+        except Exception as error:
+            with self._lock:
+                self.errors.append(error)
+        with self._lock:
+            self.done += 1
+            if self.done == self.total:
+                self._finish()
+
+    def _finish(self):
+        self._finished_at = time.perf_counter()
+        self._finished.set()
+
+    @property
+    def finished(self):
+        return self._finished.is_set()
+
+    @property
+    def elapsed(self):
+        if self._started_at is None:
+            return 0.0
+        return (self._finished_at or time.perf_counter()) - self._started_at
+
+    def wait(self, timeout=None):
+        """Block until every task has finished or ``timeout`` seconds have passed; return whether it finished."""
+        return self._finished.wait(timeout)